@@ -1,11 +1,11 @@
 import streamlit as st
-import json
-import re
-import numpy as np
-import matplotlib.pyplot as plt
-from google.api_core import exceptions  # For rate limit handling
-from logic_v2_GitHub import get_gemini_model, load_problems, check_numeric_match, analyze_and_send_report
-from render_v2_GitHub import render_problem_diagram, render_lecture_visual
+from itertools import groupby
+from logic_v2_GitHub import get_gemini_model, check_numeric_match, analyze_and_send_report
+from render_v2_GitHub import render_problem_diagram, render_lecture_visual, preload
+from metrics_v2_GitHub import span, record_usage, start_exporter, count
+from assets_v2_GitHub import diagram_asset, diagram_html, first_view_bytes
+from variants_v2_GitHub import TEMPLATES, student_seed, variant_problem, warm_variants
+from catalog_v2_GitHub import PAGE_SIZE, categories, display_name, get_problem, get_problems, search
 
 # 1. Page Configuration
 st.set_page_config(page_title="Socratic Engineering Tutor", layout="wide")
@@ -36,6 +36,9 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Metrics endpoint / JSON dump (no-op unless TUTOR_METRICS_PORT or TUTOR_METRICS_JSON is set)
+start_exporter()
+
 # 3. Initialize Session State
 if "page" not in st.session_state: st.session_state.page = "landing"
 if "chat_sessions" not in st.session_state: st.session_state.chat_sessions = {}
@@ -43,9 +46,8 @@ if "grading_data" not in st.session_state: st.session_state.grading_data = {}
 if "user_name" not in st.session_state: st.session_state.user_name = None
 if "lecture_topic" not in st.session_state: st.session_state.lecture_topic = None
 if "lecture_session" not in st.session_state: st.session_state.lecture_session = None
-
-# Problems are now strictly loaded dynamically
-PROBLEMS = load_problems()
+if "diagram_bytes" not in st.session_state: st.session_state.diagram_bytes = 0
+if "seen_assets" not in st.session_state: st.session_state.seen_assets = set()
 
 # --- Page 0: Name Entry ---
 if st.session_state.user_name is None:
@@ -59,8 +61,15 @@ if st.session_state.user_name is None:
                 st.rerun()
             else:
                 st.warning("Identification is required for academic reporting.")
+    # Load matplotlib in the background while the student types their name
+    preload()
     st.stop()
 
+# Per-student numbers for templated problems, generated once so opening a problem never waits
+if "variant_seed" not in st.session_state:
+    st.session_state.variant_seed = student_seed(st.session_state.user_name)
+    warm_variants(get_problems(TEMPLATES), [st.session_state.variant_seed])
+
 # --- Page 1: Main Menu ---
 if st.session_state.page == "landing":
     st.title(f"🚀 Welcome, {st.session_state.user_name}!")
@@ -88,59 +97,53 @@ if st.session_state.page == "landing":
     st.markdown("---")
     st.subheader("📝 Engineering Review Problems")
     
-    categories = {}
-    for p in PROBLEMS:
-        raw_cat = p.get('category', 'General').split(":")[0].strip()
-        clean_cat = raw_cat.replace("HW 6", "").replace("HW 7", "").replace("HW 8", "").strip()
-        low_cat = clean_cat.lower()
-        
-        # Mapping Logic
-        if "statics" in low_cat:
-            cat_main = "00_Statics"
-        elif "kinetics" in low_cat and ("rigid" in low_cat or "translation" in low_cat):
-            cat_main = "08_Kinetics of Rigid Body"
-        elif "kinematics" in low_cat and "rigid" not in low_cat and "rotation" not in low_cat:
-            cat_main = "01_Kinematics of Particle"
-        elif "rectilinear" in low_cat:
-            cat_main = "02_Kinetics of Particles (Rectilinear)"
-        elif "curvilinear" in low_cat:
-            cat_main = "03_Kinetics of Particles (Curvilinear)"
-        elif "work" in low_cat or "energy" in low_cat:
-            cat_main = "04_Work and Energy"
-        elif "impulse" in low_cat or "momentum" in low_cat:
-            cat_main = "05_Impulse and Momentum"
-        elif "impact" in low_cat:
-            cat_main = "06_Impact"
-        elif "rotation" in low_cat or "rigid" in low_cat:
-            cat_main = "07_Kinematics of Rigid Body"
-        else:
-            cat_main = clean_cat
-            
-        if cat_main not in categories: categories[cat_main] = []
-        categories[cat_main].append(p)
+    cat_counts = categories()
+    filter_cols = st.columns([3, 2])
+    with filter_cols[0]:
+        query = st.text_input("🔍 Search problems", placeholder="e.g. pile driver, restitution, omega")
+    with filter_cols[1]:
+        cat_choice = st.selectbox(
+            "Category", [None] + [c for c, _ in cat_counts],
+            format_func=lambda c: "All categories" if c is None else f"{display_name(c)} ({dict(cat_counts)[c]})"
+        )
+    # A new search or filter starts again from the first page
+    if st.session_state.get("catalog_filter") != (query, cat_choice):
+        st.session_state.catalog_filter = (query, cat_choice)
+        st.session_state.catalog_page = 0
 
-    sorted_cat_keys = sorted(categories.keys())
-    for cat_key in sorted_cat_keys:
-        probs = categories[cat_key]
-        display_name = re.sub(r'^[0-9]+_', '', cat_key) 
-        
-        st.markdown(f"#### {display_name}")
+    rows, total = search(query, cat_choice, st.session_state.catalog_page)
+    if not rows:
+        st.info("No problems match your search.")
+
+    for cat_key, group in groupby(rows, key=lambda r: r[1]):
+        probs = list(group)
+        st.markdown(f"#### {display_name(cat_key)}")
         for i in range(0, len(probs), 3):
             cols = st.columns(3)
             for j in range(3):
                 if i + j < len(probs):
-                    prob = probs[i + j]
-                    sub_label = prob["hw_subtitle"].capitalize() if "hw_subtitle" in prob else prob.get('category', '').split(":")[-1].strip()
-                    if sub_label == display_name or not sub_label:
-                        sub_label = f"Problem {prob['id']}"
-                        
+                    pid, _, sub_label = probs[i + j]
                     with cols[j]:
-                        if st.button(f"**{sub_label}**\n({prob['id']})", key=f"btn_{prob['id']}", use_container_width=True):
-                            st.session_state.current_prob = prob
+                        if st.button(f"**{sub_label}**\n({pid})", key=f"btn_{pid}", use_container_width=True):
+                            st.session_state.current_prob = variant_problem(get_problem(pid), st.session_state.variant_seed)
                             st.session_state.page = "chat"
-                            if prob['id'] in st.session_state.chat_sessions:
-                                del st.session_state.chat_sessions[prob['id']]
+                            if pid in st.session_state.chat_sessions:
+                                del st.session_state.chat_sessions[pid]
                             st.rerun()
+
+    n_pages = -(-total // PAGE_SIZE)
+    if n_pages > 1:
+        page_cols = st.columns([1, 2, 1])
+        with page_cols[0]:
+            if st.button("◀ Previous", disabled=st.session_state.catalog_page == 0, use_container_width=True):
+                st.session_state.catalog_page -= 1
+                st.rerun()
+        with page_cols[1]:
+            st.caption(f"Page {st.session_state.catalog_page + 1} of {n_pages} · {total} problems")
+        with page_cols[2]:
+            if st.button("Next ▶", disabled=st.session_state.catalog_page >= n_pages - 1, use_container_width=True):
+                st.session_state.catalog_page += 1
+                st.rerun()
     st.markdown("---")
 
 # --- Page 2: Socratic Chat ---
@@ -154,7 +157,19 @@ elif st.session_state.page == "chat":
     with top_cols[0]:
         st.subheader(f"📌 {prob['category']}")
         st.info(prob['statement'])
-        st.image(render_problem_diagram(prob), width=450)
+        asset = diagram_asset(prob)
+        if asset:
+            # Static, content-hashed URL: the browser downloads it once per session at most
+            st.markdown(diagram_html(asset, width=450), unsafe_allow_html=True)
+            first_view = asset["png"]["file"] not in st.session_state.seen_assets
+            st.session_state.seen_assets.add(asset["png"]["file"])
+            sent, mode = (first_view_bytes(asset) if first_view else 0), "static"
+        else:
+            diagram = render_problem_diagram(prob)
+            st.image(diagram, width=450)
+            sent, mode = len(diagram.getvalue()), "inline"
+        st.session_state.diagram_bytes += sent
+        count("tutor_diagram_bytes_total", sent, mode=mode)
     
     with top_cols[1]:
         st.subheader("💬 Socratic Tutor")
@@ -184,7 +199,9 @@ elif st.session_state.page == "chat":
                     st.toast(f"✅ Correct!", icon="🎯")
             
             if p_id in st.session_state.chat_sessions:
-                st.session_state.chat_sessions[p_id].send_message(user_input)
+                with span("gemini.send_message.chat"):
+                    response = st.session_state.chat_sessions[p_id].send_message(user_input)
+                record_usage("gemini.send_message.chat", response)
                 st.rerun()
 
     # --- UPDATED SUBMISSION LOGIC: Fixed Missing chat_history ---
@@ -201,7 +218,9 @@ elif st.session_state.page == "chat":
                 report_text = analyze_and_send_report(
                     st.session_state.user_name, 
                     st.session_state.grading_data,
-                    current_history
+                    current_history,
+                    prob=prob,
+                    solved=solved
                 )
                 
                 st.session_state.last_report = report_text
@@ -281,7 +300,9 @@ elif st.session_state.page == "lecture":
                 st.write(f"Welcome to the lecture on **{st.session_state.lecture_topic}**. Adjust the sliders and let's begin...")
 
         if lec_input := st.chat_input("Discuss the topic..."):
-            st.session_state.lecture_session.send_message(lec_input)
+            with span("gemini.send_message.lecture"):
+                response = st.session_state.lecture_session.send_message(lec_input)
+            record_usage("gemini.send_message.lecture", response)
             st.rerun()
 
     if st.button("🏠 Exit Lecture", use_container_width=True):
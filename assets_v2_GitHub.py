@@ -0,0 +1,264 @@
+"""Static diagram assets: display-sized WebP/PNG variants with content-hash filenames.
+
+Build (at deploy time, after any change under images/):
+    python assets_v2_GitHub.py build
+    python assets_v2_GitHub.py report --views 10   # bytes per session, before vs after
+
+If the manifest is missing, or older than a file under images/, the first
+lookup in a process starts the build in a background thread; until it
+finishes, the chat page falls back to the rendered PNG.
+
+Variants are written to static/diagrams/ and served by Streamlit's static file
+serving (server.enableStaticServing) at app/static/diagrams/. Filenames change
+whenever content changes, so every URL is immutable and safe to cache forever.
+Streamlit itself only sends Last-Modified for these files; ImmutableAssets adds
+`Cache-Control: public, max-age=31536000, immutable` when the app is started
+through serve_v2_GitHub.py. TUTOR_ASSET_BASE_URL can point the URLs at a CDN
+instead.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+from render_v2_GitHub import problem_image_path
+from metrics_v2_GitHub import record_cache
+
+SOURCE_DIR = "images"
+STATIC_DIR = os.path.join("static", "diagrams")
+URL_PREFIX = os.environ.get("TUTOR_ASSET_BASE_URL", "app/static/diagrams").rstrip("/")
+MANIFEST_PATH = os.path.join(STATIC_DIR, "manifest.json")
+
+DISPLAY_WIDTH = 450  # matches the chat page's diagram width
+SCALES = (1, 2)      # 1x and 2x (HiDPI) variants
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_manifest = None
+_manifest_mtime = None
+_build_lock = threading.Lock()
+_build_checked = False
+
+
+def _slug(rel_path):
+    stem = os.path.splitext(rel_path)[0].replace("/images/", "/")
+    return re.sub(r"[^a-z0-9]+", "-", stem.lower()).strip("-")
+
+
+def _encode(img, fmt):
+    buf = io.BytesIO()
+    if fmt == "webp":
+        # Lossy q85 is ~3.5x smaller than lossless for these scanned diagrams
+        img.save(buf, format="WEBP", quality=85, method=6)
+    else:
+        img.quantize(256).save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def _write_atomic(path, data):
+    """Writes via a unique temp file, so concurrent builds never expose a partial file."""
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _write_variant(data, slug, width, ext, out_dir):
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    name = f"{slug}-{width}w.{digest}.{ext}"
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    return {"file": name, "hash": digest, "bytes": len(data)}
+
+
+def build_assets(src_dir=SOURCE_DIR, out_dir=STATIC_DIR):
+    """Converts every PNG under src_dir into resized variants and writes the manifest."""
+    from PIL import Image  # Pillow ships with matplotlib
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for root, _, files in os.walk(src_dir):
+        for fname in sorted(files):
+            if not fname.lower().endswith(".png"):
+                continue
+            src = os.path.join(root, fname)
+            rel = os.path.relpath(src, src_dir).replace(os.sep, "/")
+            slug = _slug(rel)
+            with Image.open(src) as im:
+                orig_w, orig_h = im.size
+                rgba = im.convert("RGBA")
+            img = Image.new("RGB", rgba.size, "white")
+            img.paste(rgba, mask=rgba.getchannel("A"))  # flatten onto the page background
+
+            entry = {"source_bytes": os.path.getsize(src), "width": min(DISPLAY_WIDTH, orig_w), "webp": {}}
+            for scale in SCALES:
+                w = min(DISPLAY_WIDTH * scale, orig_w)
+                h = round(orig_h * w / orig_w)
+                resized = img if w == orig_w else img.resize((w, h), Image.LANCZOS)
+                entry["webp"][f"{scale}x"] = _write_variant(_encode(resized, "webp"), slug, w, "webp", out_dir)
+                if scale == 1:
+                    entry["height"] = h
+                    entry["png"] = _write_variant(_encode(resized, "png"), slug, w, "png", out_dir)
+            manifest[f"{src_dir}/{rel}"] = entry
+
+    # Drop variants no longer referenced by the manifest (but not another build's temp files)
+    live = {v["file"] for e in manifest.values() for v in [e["png"], *e["webp"].values()]}
+    for fname in os.listdir(out_dir):
+        if fname != os.path.basename(MANIFEST_PATH) and fname not in live and not fname.endswith(".tmp"):
+            os.remove(os.path.join(out_dir, fname))
+
+    _write_atomic(os.path.join(out_dir, "manifest.json"), json.dumps(manifest, indent=1, sort_keys=True).encode())
+    return manifest
+
+
+def _sources_newer_than(mtime, src_dir=SOURCE_DIR):
+    for root, _, files in os.walk(src_dir):
+        for fname in files:
+            if fname.lower().endswith(".png") and os.path.getmtime(os.path.join(root, fname)) > mtime:
+                return True
+    return False
+
+
+def _background_build():
+    try:
+        build_assets()
+    except Exception as e:  # the page keeps using rendered PNGs
+        print(f"Diagram asset build failed: {e}")
+
+
+def ensure_assets():
+    """Once per process: starts a background build if the manifest is missing or older than images/."""
+    global _build_checked
+    with _build_lock:
+        if _build_checked:
+            return
+        _build_checked = True
+    try:
+        stale = _sources_newer_than(os.path.getmtime(MANIFEST_PATH))
+    except OSError:
+        stale = True
+    if stale:
+        threading.Thread(target=_background_build, daemon=True, name="tutor-asset-build").start()
+
+
+def load_manifest(build=True):
+    """Returns the asset manifest ({} if not built), reloading it when the file changes."""
+    global _manifest, _manifest_mtime
+    if build:
+        ensure_assets()
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        return {}
+    hit = _manifest is not None and mtime == _manifest_mtime
+    record_cache("asset_manifest", hit)
+    if not hit:
+        with open(MANIFEST_PATH) as f:
+            _manifest = json.load(f)
+        _manifest_mtime = mtime
+    return _manifest
+
+
+def diagram_asset(prob):
+    """Returns the manifest entry for a problem's diagram, or None if it must be rendered."""
+    img_path = problem_image_path(prob)
+    if img_path is None:
+        return None
+    return load_manifest().get(img_path.replace(os.sep, "/"))
+
+
+def asset_url(variant):
+    return f"{URL_PREFIX}/{variant['file']}"
+
+
+def diagram_html(asset, width=DISPLAY_WIDTH):
+    """<picture> markup: WebP 1x/2x with a PNG fallback, all cacheable by URL."""
+    srcset = ", ".join(f"{asset_url(v)} {scale}" for scale, v in sorted(asset["webp"].items()))
+    return (
+        f'<picture><source type="image/webp" srcset="{srcset}">'
+        f'<img src="{asset_url(asset["png"])}" width="{min(width, asset["width"])}" '
+        f'style="max-width:100%;height:auto" alt="Problem diagram"></picture>'
+    )
+
+
+def first_view_bytes(asset, scale="2x"):
+    """Bytes the browser downloads the first time it shows an asset.
+
+    The server cannot see the device pixel ratio, so the default counts the 2x
+    WebP a HiDPI browser picks from the srcset (an upper bound); pass "1x" for
+    standard displays.
+    """
+    return asset["webp"][scale]["bytes"]
+
+
+class ImmutableAssets:
+    """ASGI middleware: long-lived Cache-Control on the hash-named diagram files."""
+
+    def __init__(self, app, path="/app/static/diagrams/"):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or self.path not in path or path.endswith("/manifest.json"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"cache-control"]
+                message = dict(message, headers=headers + [(b"cache-control", CACHE_CONTROL.encode())])
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache)
+
+
+def report(views):
+    """Prints diagram bytes per session (each diagram viewed `views` times) before and after."""
+    from logic_v2_GitHub import load_problems
+    from render_v2_GitHub import render_problem_diagram
+
+    manifest = load_manifest(build=False)
+    if not manifest:
+        print("No manifest found; run `python assets_v2_GitHub.py build` first.")
+        return
+    before = after_1x = after_2x = 0
+    print(f"{'problem':<12} {'inline PNG':>11} {'WebP 1x':>9} {'WebP 2x':>9}")
+    for prob in load_problems():
+        asset = diagram_asset(prob)
+        if asset is None:
+            continue
+        inline = len(render_problem_diagram(prob).getvalue())
+        before += inline * views
+        after_1x += first_view_bytes(asset, "1x")  # later views hit the browser cache
+        after_2x += first_view_bytes(asset, "2x")
+        print(f"{prob['id']:<12} {inline:>11,} {asset['webp']['1x']['bytes']:>9,} {asset['webp']['2x']['bytes']:>9,}")
+    if before:
+        print(f"\nSession with every diagram viewed {views}x: before {before:,} B")
+        for label, after in (("standard display (1x)", after_1x), ("HiDPI display (2x)", after_2x)):
+            print(f"  after, {label}: {after:,} B ({100 * (1 - after / before):.1f}% less)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or report on static diagram assets.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build")
+    rep = sub.add_parser("report")
+    rep.add_argument("--views", type=int, default=5, help="reruns per diagram in a session")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        manifest = build_assets()
+        src = sum(e["source_bytes"] for e in manifest.values())
+        out_1x = sum(e["webp"]["1x"]["bytes"] for e in manifest.values())
+        out_2x = sum(e["webp"]["2x"]["bytes"] for e in manifest.values())
+        print(f"Built {len(manifest)} diagrams: source PNG {src:,} B -> WebP 1x {out_1x:,} B, 2x {out_2x:,} B")
+    else:
+        report(args.views)
+
+
+if __name__ == "__main__":
+    main()
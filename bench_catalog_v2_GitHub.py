@@ -0,0 +1,141 @@
+"""Catalog benchmark: load time and memory of the JSON list vs the SQLite catalog.
+
+Usage:
+    python bench_catalog_v2_GitHub.py [--sizes 10000 100000]
+
+Synthetic catalogs are made by cloning the real problems with new ids and a few
+extra words per statement, then written both as one JSON list (what
+load_problems reads) and as a catalog database. Memory is the Python heap peak
+(tracemalloc); SQLite's own page cache (about 2 MB by default) is not included.
+
+The rebuild rows measure what a running app pays when a source file changes:
+the JSON load plus build_catalog (done in a background thread), and search
+latency on the old file while that rebuild runs.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import catalog_v2_GitHub as catalog
+from logic_v2_GitHub import load_problems
+
+WORDS = ["beam", "pulley", "spring", "collar", "disk", "crate", "piston", "lever", "gear", "cable", "slider", "drum"]
+QUERIES = ["pile", "restitution", "spring collar", "omega", "velocity impact", "zzz"]
+
+
+def synthesize(base, n, rng):
+    problems = []
+    for i in range(n):
+        prob = dict(base[i % len(base)])
+        prob["id"] = f"{prob['id']}_{i}"
+        prob["statement"] = f"{prob['statement']} {' '.join(rng.sample(WORDS, 3))}"
+        problems.append(prob)
+    return problems
+
+
+def measure(func):
+    """Returns (seconds, peak traced bytes, result) for one call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def bench(n, base, workdir):
+    problems = synthesize(base, n, random.Random(n))
+    json_path = os.path.join(workdir, f"problems_{n}.json")
+    db_path = os.path.join(workdir, f"problems_{n}.db")
+    with open(json_path, "w") as f:
+        json.dump(problems, f)
+
+    build_s = time.perf_counter()
+    catalog.build_catalog(problems, db_path)
+    build_s = time.perf_counter() - build_s
+    del problems
+
+    def legacy():
+        with open(json_path) as f:
+            return json.load(f)
+
+    def landing():
+        catalog.close_catalog()
+        catalog.open_catalog(db_path, sources=None)
+        catalog.categories()
+        return catalog.search()
+
+    t_json, m_json, _ = measure(legacy)
+    t_cat, m_cat, _ = measure(landing)
+    def rebuild():
+        catalog.build_catalog(legacy(), f"{db_path}.rebuilt")
+
+    t_rebuild = time.perf_counter()
+    rebuild()
+    t_rebuild = time.perf_counter() - t_rebuild
+    _, m_rebuild, _ = measure(rebuild)  # separate run: tracemalloc slows the build severalfold
+    os.remove(f"{db_path}.rebuilt")
+
+    print(f"\n{n:,} problems (JSON {os.path.getsize(json_path) / 1e6:.1f} MB, catalog {os.path.getsize(db_path) / 1e6:.1f} MB, built in {build_s:.2f} s)")
+    print(f"  JSON load_problems-style load : {t_json * 1000:8.1f} ms  Python heap peak {m_json / 1e6:7.1f} MB")
+    print(f"  catalog open + first page     : {t_cat * 1000:8.1f} ms  Python heap peak {m_cat / 1e6:7.1f} MB")
+    print(f"  rebuild (JSON load + build)   : {t_rebuild * 1000:8.1f} ms  Python heap peak {m_rebuild / 1e6:7.1f} MB")
+    for q in QUERIES:
+        start = time.perf_counter()
+        rows, total = catalog.search(q)
+        print(f"  search {q!r:<20}: {(time.perf_counter() - start) * 1000:8.2f} ms  ({total} hits)")
+    middle = (n // catalog.PAGE_SIZE) // 2
+    start = time.perf_counter()
+    rows, total = catalog.search("", page=middle)
+    print(f"  middle page of all problems   : {(time.perf_counter() - start) * 1000:8.2f} ms")
+    pid = rows[0][0]
+    start = time.perf_counter()
+    catalog.get_problem(pid)
+    print(f"  get_problem (cold)            : {(time.perf_counter() - start) * 1000:8.2f} ms")
+    catalog.close_catalog()
+    during_rebuild(json_path, db_path, legacy)
+
+
+def during_rebuild(json_path, db_path, legacy):
+    """Changes the source under a live catalog and times searches until the rebuilt file is served."""
+    import logic_v2_GitHub as logic
+    original = logic.load_problems
+    logic.load_problems = legacy  # the runtime rebuild reads the synthetic JSON
+    try:
+        catalog.open_catalog(db_path, sources=(json_path,))
+        os.utime(json_path)  # as a deploy or edit would
+        start = time.perf_counter()
+        latencies = []
+        while True:
+            t = time.perf_counter()
+            catalog.search("pile")
+            latencies.append(time.perf_counter() - t)
+            if catalog._rebuild_thread is None and len(latencies) > 1:
+                break
+            time.sleep(0.01)
+        swapped = time.perf_counter() - start
+        latencies.sort()
+        print(f"  search during rebuild         : median {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+              f"max {latencies[-1] * 1000:.1f} ms over {len(latencies)} queries; new file served after {swapped:.1f} s")
+    finally:
+        logic.load_problems = original
+        catalog.close_catalog()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    base = load_problems()
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            bench(n, base, workdir)
+
+
+if __name__ == "__main__":
+    main()
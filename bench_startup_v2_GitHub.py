@@ -0,0 +1,99 @@
+"""Startup benchmark: how long a fresh worker takes to import what the name-entry page needs.
+
+Usage:
+    python bench_startup_v2_GitHub.py [--runs 5] [--top 15] [--record bench_startup.jsonl]
+
+Each run is a fresh interpreter started with `-X importtime`, so results reflect a
+cold process (OS file cache aside). The heavy modules that are now loaded lazily
+are timed separately for comparison with the old eager imports.
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+APP_SCRIPT = "Dynamics_tutor_v2_GitHub.py"
+# What the app used to import eagerly at top level
+LAZY_IMPORTS = "import matplotlib; matplotlib.use('Agg'); import matplotlib.pyplot, numpy, google.generativeai, google.api_core"
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def app_imports(script=APP_SCRIPT):
+    """Builds an import statement from the app script's own top-level imports."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script)
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        modules += [n for n in names if n not in modules]
+    return "import " + ", ".join(modules)
+
+
+def run_once(code):
+    """Runs code in a fresh interpreter; returns (wall seconds, {module: cumulative us})."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m and len(m.group(3)) == 1:  # top-level imports only
+            cumulative[m.group(4)] = int(m.group(2))
+    return wall, cumulative
+
+
+def bench(code, runs):
+    walls, last = [], {}
+    for _ in range(runs):
+        wall, last = run_once(code)
+        walls.append(wall)
+    return {"median_s": statistics.median(walls), "min_s": min(walls), "top_imports": last}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest top-level imports to show")
+    parser.add_argument("--record", help="append the result as one JSON line to this file")
+    args = parser.parse_args()
+
+    result = {"timestamp": time.time(), "python": sys.version.split()[0]}
+    startup = app_imports()
+    print(f"startup = {startup}")
+    for label, code in (("startup", startup), ("lazy_modules", LAZY_IMPORTS)):
+        try:
+            r = bench(code, args.runs)
+        except RuntimeError as e:
+            print(f"{label}: failed ({e})")
+            continue
+        print(f"{label}: median {r['median_s'] * 1000:.0f} ms, min {r['min_s'] * 1000:.0f} ms over {args.runs} runs")
+        slowest = sorted(r["top_imports"].items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        for mod, us in slowest:
+            print(f"    {us / 1000:8.1f} ms  {mod}")
+        result[label] = {"median_s": r["median_s"], "min_s": r["min_s"]}
+
+    if args.record:
+        with open(args.record, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Variant engine benchmark: batch generation across all templated problems.
+
+Usage:
+    python bench_variants_v2_GitHub.py [--n 100000] [--roster 200] [--students 2000]
+
+Also reports, over --students seeds, how often the published answer or a
+classmate's answer would pass check_numeric_match against a student's variant.
+"""
+import argparse
+import time
+import numpy as np
+from logic_v2_GitHub import load_problems
+from variants_v2_GitHub import TEMPLATES, TOLERANCE, generate_variants, variant_problem, warm_variants
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def accepted(answer, correct):
+    """Vectorised check_numeric_match: is answer within TOLERANCE of correct?"""
+    return np.abs(answer - correct) <= TOLERANCE * np.abs(correct)
+
+
+def overlap(problems, students):
+    """Prints per-target acceptance of the published answer and of a classmate's answer."""
+    seeds = np.arange(students, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    print(f"\nAnswer overlap over {students} students (fraction accepted)")
+    print(f"{'problem':<10} {'target':<12} {'published':>9} {'classmate':>9}")
+    for prob in problems:
+        _, targets = generate_variants(prob, seeds)
+        pub_all = np.ones(students, dtype=bool)
+        pair_all = np.ones((students, students), dtype=bool)
+        rows = []
+        for name, values in targets.items():
+            pub = accepted(prob["targets"][name], values)
+            pair = accepted(values[:, None], values[None, :])  # [i, j]: i's answer accepted for j
+            pub_all &= pub
+            pair_all &= pair
+            rows.append((name, pub, pair))
+        if len(rows) > 1:
+            rows.append(("(all)", pub_all, pair_all))
+        for name, pub, pair in rows:
+            classmate = (pair.sum() - students) / (students * (students - 1))  # distinct pairs only
+            print(f"{prob['id']:<10} {name:<12} {pub.mean():>9.1%} {classmate:>9.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=100000, help="total variants across all templates")
+    parser.add_argument("--roster", type=int, default=200, help="class size for the cached-dict benchmark")
+    parser.add_argument("--students", type=int, default=2000, help="class size for the answer-overlap report")
+    args = parser.parse_args()
+
+    problems = [p for p in load_problems() if p.get("id") in TEMPLATES]
+    per_template = args.n // len(problems)
+    seeds = np.arange(per_template, dtype=np.uint64) * np.uint64(2654435761)
+    total = 0.0
+    for prob in problems:
+        elapsed, (_, targets) = timed(generate_variants, prob, seeds)
+        total += elapsed
+        first = next(iter(targets.values()))
+        print(f"{prob['id']:<10} {per_template:>8} variants  {elapsed * 1000:8.1f} ms  (first target mean {first.mean():.4g})")
+    n = per_template * len(problems)
+    print(f"Batch targets: {n} variants in {total * 1000:.1f} ms ({n / total:,.0f} variants/s)")
+
+    roster = list(range(args.roster))
+    elapsed, _ = timed(warm_variants, problems, roster)
+    print(f"Roster warm-up: {args.roster} students x {len(problems)} problems in {elapsed * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    for seed in roster:
+        for prob in problems:
+            variant_problem(prob, seed)
+    per_open = (time.perf_counter() - start) / (len(roster) * len(problems))
+    print(f"Cached open: {per_open * 1e6:.1f} us per problem")
+    overlap(problems, args.students)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Problem catalog: SQLite store with lazy problem bodies and an inverted search index.
+
+The catalog is built from load_problems() (problems_v2_GitHub.json plus the
+problems merged in logic_v2_GitHub) at deploy time:
+
+    python catalog_v2_GitHub.py build
+
+Every query stats the source files; when their size or mtime no longer match
+the signature stored in the catalog, a background thread rebuilds it while
+queries keep reading the old file, and the next query after the swap reopens
+it. The landing page only reads (id, category, label) rows for the current page
+of results; a problem's full body is loaded when it is opened.
+"""
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from metrics_v2_GitHub import record_cache, traced
+
+CATALOG_PATH = "problems_v2_GitHub.db"
+SOURCE_FILES = ("problems_v2_GitHub.json", "logic_v2_GitHub.py", "catalog_v2_GitHub.py")  # this file: tokenizer/schema
+PAGE_SIZE = 60  # the current catalog fits on one page
+BUILD_CHUNK = 2000  # problems per insert batch: bounds build memory and lets query threads run in between
+BODY_CACHE_SIZE = 512
+
+STOPWORDS = {"a", "the", "of", "and", "to", "is", "in", "at", "on", "by", "an", "as", "if", "it", "be", "for", "with", "from", "which", "that", "its"}
+TOKEN_RE = re.compile(r"[^\W_]+")
+COMPOUND_RE = re.compile(r"[^\W_]+(?:[._][^\W_]+)+")  # ids and decimals: k_2.6_3, 2.6
+
+SCHEMA = """
+CREATE TABLE problems (ord INTEGER PRIMARY KEY, id TEXT UNIQUE, cat_main TEXT, label TEXT, body TEXT);
+CREATE INDEX problems_cat ON problems (cat_main, ord);
+CREATE TABLE terms (term TEXT, ord INTEGER, PRIMARY KEY (term, ord)) WITHOUT ROWID;
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_conn = None
+_conn_path = _conn_sources = None
+_conn_file = _conn_signature = None  # (inode, mtime) of the open file and the source signature stored in it
+_conn_lock = threading.Lock()
+_rebuild_thread = None
+_failed_signature = None
+_bodies = {}  # pid -> body JSON text (None if unknown), cleared whenever the catalog is reopened
+_bodies_lock = threading.Lock()
+
+
+def main_category(prob):
+    """Maps a problem's category onto the landing page's ordered sections (e.g. '06_Impact')."""
+    raw_cat = prob.get('category', 'General').split(":")[0].strip()
+    clean_cat = raw_cat.replace("HW 6", "").replace("HW 7", "").replace("HW 8", "").strip()
+    low_cat = clean_cat.lower()
+
+    if "statics" in low_cat:
+        return "00_Statics"
+    elif "kinetics" in low_cat and ("rigid" in low_cat or "translation" in low_cat):
+        return "08_Kinetics of Rigid Body"
+    elif "kinematics" in low_cat and "rigid" not in low_cat and "rotation" not in low_cat:
+        return "01_Kinematics of Particle"
+    elif "rectilinear" in low_cat:
+        return "02_Kinetics of Particles (Rectilinear)"
+    elif "curvilinear" in low_cat:
+        return "03_Kinetics of Particles (Curvilinear)"
+    elif "work" in low_cat or "energy" in low_cat:
+        return "04_Work and Energy"
+    elif "impulse" in low_cat or "momentum" in low_cat:
+        return "05_Impulse and Momentum"
+    elif "impact" in low_cat:
+        return "06_Impact"
+    elif "rotation" in low_cat or "rigid" in low_cat:
+        return "07_Kinematics of Rigid Body"
+    return clean_cat
+
+
+def display_name(cat_main):
+    return re.sub(r'^[0-9]+_', '', cat_main)
+
+
+def problem_label(prob, cat_main):
+    """Button label for a problem: HW subtitle or category detail, else 'Problem <id>'."""
+    sub_label = prob["hw_subtitle"].capitalize() if "hw_subtitle" in prob else prob.get('category', '').split(":")[-1].strip()
+    if sub_label == display_name(cat_main) or not sub_label:
+        sub_label = f"Problem {prob['id']}"
+    return sub_label
+
+
+def _spell_greek(text):
+    """Δ -> ' delta ', so a typed symbol matches the LaTeX command (\\Delta) in statements."""
+    if text.isascii():
+        return text
+    return "".join(f" {unicodedata.name(c).split()[-1].lower()} " if "GREEK" in unicodedata.name(c, "") else c
+                   for c in text)
+
+
+def tokenize(text):
+    """Words, digits and compound tokens (ids like k_2.6_3, decimals like 2.6), lowercased.
+
+    Each compound is also indexed from every part onwards (2.6_3, 6_3), so a
+    prefix search for any run of its parts (k_2.6, 2.6) finds it.
+    """
+    text = _spell_greek(str(text)).lower()
+    tokens = {t for t in TOKEN_RE.findall(text) if t not in STOPWORDS}
+    for comp in COMPOUND_RE.findall(text):
+        tokens.add(comp)
+        tokens.update(comp[i + 1:] for i, ch in enumerate(comp) if ch in "._")
+    return tokens
+
+
+def _source_signature(sources=SOURCE_FILES):
+    sig = []
+    for path in sources:
+        try:
+            st = os.stat(path)
+            sig.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            sig.append(f"{path}:missing")
+    return "|".join(sig)
+
+
+@traced("catalog.build")
+def build_catalog(problems, path=CATALOG_PATH, signature=""):
+    """Writes problems and their inverted index to a fresh SQLite file at path."""
+    # Unique temp file: several app processes may rebuild at once; the last os.replace wins
+    fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SCHEMA)
+        for start in range(0, len(problems), BUILD_CHUNK):
+            rows, postings = [], []
+            for ord_, prob in enumerate(problems[start:start + BUILD_CHUNK], start):
+                cat_main = main_category(prob)
+                rows.append((ord_, prob["id"], cat_main, problem_label(prob, cat_main), json.dumps(prob, ensure_ascii=False)))
+                text = " ".join([str(prob["id"]), prob.get("statement", ""), prob.get("category", ""),
+                                 display_name(cat_main), " ".join(prob.get("targets", {}))])
+                postings.extend((term, ord_) for term in tokenize(text))
+            conn.executemany("INSERT OR REPLACE INTO problems VALUES (?, ?, ?, ?, ?)", rows)
+            postings.sort()
+            conn.executemany("INSERT OR IGNORE INTO terms VALUES (?, ?)", postings)
+            time.sleep(0)  # yield the GIL to request threads during a background rebuild
+        conn.execute("INSERT INTO meta VALUES ('signature', ?)", (signature,))
+        conn.commit()
+    except BaseException:
+        conn.close()
+        os.remove(tmp)
+        raise
+    conn.close()
+    os.replace(tmp, path)
+
+
+def _file_id(path):
+    try:
+        st = os.stat(path)
+        return st.st_ino, st.st_mtime_ns
+    except OSError:
+        return None
+
+
+def _connect(path):
+    """(Re)opens the shared connection on path's current file; callers hold _conn_lock."""
+    global _conn, _conn_file, _conn_signature
+    if _conn is not None:
+        _conn.close()
+    _clear_bodies()
+    _conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    _conn_file = _file_id(path)
+    try:
+        row = _conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+    except sqlite3.Error:
+        row = None
+    _conn_signature = row[0] if row else None
+
+
+def _rebuild(path, signature):
+    global _rebuild_thread, _failed_signature
+    try:
+        from logic_v2_GitHub import load_problems
+        build_catalog(load_problems(), path, signature)
+    except Exception as e:  # keep serving the old file; do not retry this signature
+        print(f"Catalog rebuild failed: {e}")
+        _failed_signature = signature
+    finally:
+        with _conn_lock:
+            _rebuild_thread = None
+
+
+def _current(path, sources):
+    """The shared connection for path, refreshed if the file was replaced; callers hold _conn_lock.
+
+    A stale catalog keeps being served while a background thread rebuilds it;
+    the first query after the new file lands reopens it. Only a missing file
+    is built synchronously, since there is nothing to serve yet.
+    """
+    global _conn_path, _conn_sources, _rebuild_thread
+    if _conn is None or path != _conn_path:
+        if _file_id(path) is None:
+            from logic_v2_GitHub import load_problems
+            build_catalog(load_problems(), path, _source_signature(sources) if sources else "")
+        _connect(path)
+        _conn_path, _conn_sources = path, sources
+    elif _file_id(path) != _conn_file:  # rebuilt by our thread or another process
+        _connect(path)
+    if sources and _rebuild_thread is None:
+        signature = _source_signature(sources)
+        if signature != _conn_signature and signature != _failed_signature:
+            _rebuild_thread = threading.Thread(target=_rebuild, args=(path, signature), daemon=True,
+                                               name="tutor-catalog-rebuild")
+            _rebuild_thread.start()
+    return _conn
+
+
+def open_catalog(path=CATALOG_PATH, sources=SOURCE_FILES):
+    """Returns the shared read-only connection, starting a background rebuild if its sources changed.
+
+    Later queries keep using this path and re-check it with one stat call per
+    source file plus one for the catalog itself. Pass sources=None to open a
+    prebuilt catalog as-is.
+    """
+    with _conn_lock:
+        return _current(path, sources)
+
+
+def wait_for_rebuild(timeout=None):
+    """Blocks until a running background rebuild (if any) has finished."""
+    thread = _rebuild_thread
+    if thread is not None:
+        thread.join(timeout)
+
+
+def close_catalog():
+    """Closes the shared connection; the next query reopens the default catalog."""
+    global _conn, _conn_path, _conn_sources, _conn_file, _conn_signature
+    wait_for_rebuild()
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = None
+        _conn_path = _conn_sources = _conn_file = _conn_signature = None
+    _clear_bodies()
+
+
+def _query(sql, params=()):
+    with _conn_lock:
+        if _conn is None:
+            conn = _current(CATALOG_PATH, SOURCE_FILES)
+        else:
+            conn = _current(_conn_path, _conn_sources)
+        return conn.execute(sql, params).fetchall()
+
+
+@traced("catalog.search")
+def search(query="", cat_main=None, page=0, page_size=PAGE_SIZE):
+    """Returns ([(id, cat_main, label), ...], total) for one page of matching problems.
+
+    Every query word must match a term in the statement, category, target names
+    or id: as a prefix, or exactly for one-character words. A query with text but
+    no searchable words (e.g. only stopwords) matches nothing.
+    """
+    words = sorted(tokenize(query))
+    if query.strip() and not words:
+        return [], 0
+    where, params = [], []
+    for word in words:
+        if len(word) == 1:
+            where.append("p.ord IN (SELECT ord FROM terms WHERE term = ?)")
+            params.append(word)
+        else:
+            where.append("p.ord IN (SELECT ord FROM terms WHERE term >= ? AND term < ?)")
+            params += [word, word + "\uffff"]
+    if cat_main:
+        where.append("p.cat_main = ?")
+        params.append(cat_main)
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+    total = _query(f"SELECT COUNT(*) FROM problems p {clause}", params)[0][0]
+    rows = _query(
+        f"SELECT p.id, p.cat_main, p.label FROM problems p {clause} ORDER BY p.cat_main, p.ord LIMIT ? OFFSET ?",
+        params + [page_size, page * page_size],
+    )
+    return rows, total
+
+
+def categories():
+    """Returns [(cat_main, problem count)] in landing-page order."""
+    return _query("SELECT cat_main, COUNT(*) FROM problems GROUP BY cat_main ORDER BY cat_main")
+
+
+def _clear_bodies():
+    with _bodies_lock:
+        _bodies.clear()
+
+
+def _load_body(pid):
+    with _bodies_lock:
+        hit = pid in _bodies
+        body = _bodies.get(pid)
+    record_cache("catalog_body", hit)
+    if not hit:
+        row = _query("SELECT body FROM problems WHERE id = ?", (pid,))
+        body = row[0][0] if row else None
+        with _bodies_lock:
+            if len(_bodies) >= BODY_CACHE_SIZE:
+                _bodies.pop(next(iter(_bodies)))
+            _bodies[pid] = body
+    return body
+
+
+def get_problem(pid):
+    """Loads one problem's full body by id (None if unknown)."""
+    body = _load_body(pid)
+    return json.loads(body) if body is not None else None
+
+
+def get_problems(ids):
+    """Loads the problems that exist among ids."""
+    return [p for p in (get_problem(pid) for pid in ids) if p is not None]
+
+
+if __name__ == "__main__":
+    import sys
+    from logic_v2_GitHub import load_problems
+    if sys.argv[1:] != ["build"]:
+        sys.exit("usage: python catalog_v2_GitHub.py build")
+    problems = load_problems()
+    build_catalog(problems, CATALOG_PATH, _source_signature())
+    print(f"Built {CATALOG_PATH} with {len(problems)} problems")
@@ -1,15 +1,66 @@
 import streamlit as st
-import google.generativeai as genai
 import json
 import smtplib
 import re
 import os
+import time
+import uuid
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from metrics_v2_GitHub import traced, span, record_usage, count
+
+# Set TUTOR_SCORE_SHADOW=1 to also ask Gemini when the local scorer is confident,
+# recording the score difference (tutor_score_agreement_total) for calibration.
+SCORE_SHADOW = os.environ.get("TUTOR_SCORE_SHADOW") == "1"
+
+# Set TUTOR_TRANSCRIPTS=path.jsonl to keep every submitted session for offline re-grading
+TRANSCRIPTS_PATH = os.environ.get("TUTOR_TRANSCRIPTS")
+_transcript_lock = threading.Lock()
+
+SCORE_INSTRUCTION = (
+    "You are a strict Engineering Professor at Texas A&M University - Corpus Christi. "
+    "Evaluate the student's level of understanding (0-10) based ONLY on the chat history.\n\n"
+    "STRICT SCORING RUBRIC:\n"
+    "0-3: Little participation, irrelevant answers.\n"
+    "4-5: Good engagement but lacks governing equations or proper LaTeX.\n"
+    "6-8: Correctly identifying and using relevant equations in LaTeX.\n"
+    "9-10: Complete mastery with flawless physics logic.\n\n"
+    "Output ONLY the integer."
+)
+
+# Governing relations by topic keyword, matched against the student's turns. Every
+# pattern is a relation (symbols on both sides of "=") or a named law; bare symbols
+# such as \omega or \alpha do not count.
+GOVERNING_EQUATIONS = {
+    "statics": [r"\\sum\s*F_?\{?[xy]?\}?\s*=\s*0", r"\\sum\s*M_?\{?\w*\}?\s*=\s*0", r"F_?\{?[xy]\}?\s*=\s*\w*\s*\\(?:cos|sin)"],
+    "kinematics": [r"v\s*=\s*v_\{?0\}?\s*\+\s*a\s*t", r"v\^2\s*=\s*v_\{?0\}?\^2\s*\+\s*2\s*a", r"[sxy]\s*=\s*[sxy]_\{?0\}?\s*\+\s*v",
+                   r"a_n\s*=\s*(?:\\frac\{v\^2\}\{\\rho\}|v\^2\s*/\s*\\rho)", r"v_\{?\\theta\}?\s*=\s*r\s*\\dot\{?\\theta"],
+    "rectilinear": [r"\\sum\s*F_?\{?\w*\}?\s*=\s*m\s*a", r"F\s*=\s*m\s*a", r"F_?\{?f\}?\s*=\s*\\mu_?\{?[sk]?\}?\s*N", r"v\^2\s*=\s*v_\{?0\}?\^2\s*\+\s*2\s*a"],
+    "curvilinear": [r"\\sum\s*F_?\{?[ntr]\}?\s*=\s*m\s*a", r"a_n\s*=\s*(?:\\frac\{v\^2\}\{\\rho\}|v\^2\s*/\s*\\rho)", r"F_?\{?f\}?\s*=\s*\\mu_?\{?[sk]?\}?\s*N"],
+    "work": [r"T_1\s*\+\s*(?:V_1\s*\+\s*)?U_?\{?1\W{0,2}2\}?\s*=\s*T_2", r"T\s*=\s*(?:\\frac\{1\}\{2\}|0\.5|1/2)\s*m\s*v\^2",
+             r"V_g\s*=\s*m\s*g\s*h|V_e\s*=\s*(?:\\frac\{1\}\{2\}|0\.5|1/2)\s*k", r"(?i:work[- ]energy (?:principle|theorem))"],
+    "energy": [r"T_1\s*\+\s*V_1\s*=\s*T_2\s*\+\s*V_2", r"T\s*=\s*(?:\\frac\{1\}\{2\}|0\.5|1/2)\s*m\s*v\^2",
+               r"V_g\s*=\s*m\s*g\s*h|V_e\s*=\s*(?:\\frac\{1\}\{2\}|0\.5|1/2)\s*k", r"(?i:conservation of (?:mechanical )?energy)"],
+    "momentum": [r"m_?\{?\w*\}?\s*v_?\{?\w*\}?\s*\+\s*m_?\{?\w*\}?\s*v_?\{?\w*\}?\s*=\s*\(?\s*m", r"v\s*=\s*\\sqrt\{\s*2\s*g\s*h\s*\}",
+                 r"\\Delta\s*E\s*=\s*(?:T|\\frac|0\.5|1/2)", r"(?i:conservation of (?:linear )?momentum|impulse[- ]momentum (?:principle|theorem|equation))"],
+    "impulse": [r"m\s*v_\{?1\}?\s*\+\s*\\(?:int|sum)\s*F[^=]*=\s*m\s*v_\{?2", r"(?i:impulse[- ]momentum (?:principle|theorem|equation))"],
+    "impact": [r"e\s*=\s*(?:\\frac\{\s*\(?v|\(?v|\\sqrt\{\s*(?:h|\\frac\{h))", r"m_?\{?\w*\}?\s*v_?\{?\w*\}?\s*\+\s*m_?\{?\w*\}?\s*v_?\{?\w*\}?\s*=\s*\(?\s*m",
+               r"\\Delta\s*E\s*=\s*(?:T|\\frac|0\.5|1/2)", r"(?i:conservation of (?:linear )?momentum)"],
+    "rotation": [r"\\omega\s*=\s*(?:\\omega_\{?0\}?\s*\+\s*)?\\alpha\s*t", r"v\s*=\s*(?:r\s*\\omega|\\omega\s*r)", r"a_\{?t\}?\s*=\s*(?:r\s*\\alpha|\\alpha\s*r)",
+                 r"a_\{?n\}?\s*=\s*(?:r\s*\\omega\^2|\\omega\^2\s*r)", r"\\sum\s*M_?\{?\w*\}?\s*=\s*I_?\{?\w*\}?\s*\\alpha"],
+    "relative": [r"v_\{?[AB]\}?\s*=\s*v_\{?[AB]\}?\s*\+\s*v_\{?[AB]/[AB]", r"a_\{?[AB]\}?\s*=\s*a_\{?[AB]\}?\s*\+\s*\(?a_\{?[AB]/[AB]",
+                 r"v_\{?[AB]/[AB]\}?\s*=\s*\\omega\s*(?:\\times\s*)?r"],
+    "rigid": [r"\\sum\s*M_?\{?\w*\}?\s*=\s*I_?\{?\w*\}?\s*\\alpha", r"\\sum\s*F_?\{?\w*\}?\s*=\s*m\s*\\?(?:bar\{)?a", r"T\s*=\s*(?:\\frac\{1\}\{2\}|0\.5|1/2)\s*I\s*\\omega\^2"],
+}
+
+# The local scorer only awards its high band to sessions with at least this many student turns
+MIN_TURNS_CONFIDENT = 3
 
 def get_gemini_model(system_instruction):
     """Gemini 2.0 Flash 모델을 설정하고 반환합니다."""
     try:
+        import google.generativeai as genai  # heavy; only loaded once a chat is opened
         api_key = st.secrets["GEMINI_API_KEY"]
         genai.configure(api_key=api_key)
         return genai.GenerativeModel(
@@ -20,6 +71,7 @@ def get_gemini_model(system_instruction):
         st.error(f"Gemini 초기화 실패: {e}")
         return None
 
+@traced("load_problems")
 def load_problems():
     """저장소의 JSON 파일에서 문제 목록을 불러오고 새 문제를 병합합니다."""
     # List updated to include Rigid Body Kinematics (Rotation)
@@ -104,6 +156,7 @@ def load_problems():
     except Exception as e:
         return new_problems
 
+@traced("check_numeric_match")
 def check_numeric_match(user_val, correct_val, tolerance=0.05):
     """숫자를 추출하여 정답과 5% 오차 범위 내에 있는지 확인합니다."""
     try:
@@ -129,35 +182,118 @@ def get_footer_info(prob):
         return f"{title} ({subtitle})"
     return prob.get("category", "Engineering Practice")
 
-def evaluate_understanding_score(chat_history):
-    """대화 내용을 바탕으로 이해도를 0-10점으로 평가합니다."""
-    eval_instruction = (
-        "You are a strict Engineering Professor at Texas A&M University - Corpus Christi. "
-        "Evaluate the student's level of understanding (0-10) based ONLY on the chat history.\n\n"
-        "STRICT SCORING RUBRIC:\n"
-        "0-3: Little participation, irrelevant answers.\n"
-        "4-5: Good engagement but lacks governing equations or proper LaTeX.\n"
-        "6-8: Correctly identifying and using relevant equations in LaTeX.\n"
-        "9-10: Complete mastery with flawless physics logic.\n\n"
-        "Output ONLY the integer."
-    )
-    
-    model = get_gemini_model(eval_instruction)
-    if not model: return 0
+def history_turns(chat_history):
+    """Normalises Gemini chat history (or stored dicts) into (role, text) pairs."""
+    if isinstance(chat_history, str):
+        return [("user", chat_history)]
+    turns = []
+    for m in chat_history or []:
+        if isinstance(m, dict):
+            role = m.get("role", "user")
+            text = m.get("text") or " ".join(str(p) for p in m.get("parts", []))
+        else:
+            role = getattr(m, "role", "user")
+            parts = getattr(m, "parts", None) or []
+            text = " ".join(getattr(p, "text", "") or "" for p in parts)
+        turns.append((role, text))
+    return turns
+
+def score_features(chat_history, prob=None, solved=None):
+    """Computes the rubric features the local scorer uses."""
+    user_texts = [t for role, t in history_turns(chat_history) if role == "user"]
+    joined = "\n".join(user_texts)
+    category = str((prob or {}).get("category", "")).lower()
+    patterns = {p for key, pats in GOVERNING_EQUATIONS.items() if key in category for p in pats}
+    targets = (prob or {}).get("targets", {})
+    latex = len(re.findall(r"\$[^$]+\$", joined))
+    return {
+        "turns": len(user_texts),
+        "latex": latex,
+        "latex_density": latex / max(len(user_texts), 1),
+        "equations": sum(1 for p in patterns if re.search(p, joined)),
+        "solved_frac": len(solved or ()) / len(targets) if targets else 0.0,
+    }
+
+def local_understanding_score(chat_history, prob=None, solved=None):
+    """Scores clear-cut sessions locally; returns (score or None if ambiguous, features)."""
+    f = score_features(chat_history, prob, solved)
+    if f["turns"] == 0:
+        return 0, f
+    # Barely participated: no equations, no LaTeX, nothing solved
+    if f["turns"] <= 2 and f["latex"] == 0 and f["equations"] == 0 and f["solved_frac"] == 0:
+        return f["turns"], f
+    # Every target solved over a real exchange, with governing relations written in LaTeX throughout
+    if (f["solved_frac"] == 1 and f["turns"] >= MIN_TURNS_CONFIDENT
+            and f["equations"] >= 2 and f["latex_density"] >= 0.5):
+        return 8, f
+    return None, f
+
+def llm_understanding_score(chat_history, model=None):
+    """Scores a transcript 0-10 with Gemini; pass model to use another rubric or a stub.
+
+    Returns None when no score could be obtained (no model, API error, unparseable reply).
+    """
+    if model is None:
+        model = get_gemini_model(SCORE_INSTRUCTION)
+    if not model: return None
 
     try:
-        response = model.generate_content(f"Chat history to evaluate:\n{chat_history}")
+        with span("gemini.generate_content.score"):
+            response = model.generate_content(f"Chat history to evaluate:\n{chat_history}")
+        record_usage("gemini.generate_content.score", response)
         score_match = re.search(r"\d+", response.text)
         if score_match:
-            score = int(score_match.group())
-            return min(max(score, 0), 10)
-        return 0
+            return min(max(int(score_match.group()), 0), 10)
+        return None
     except Exception:
-        return 0
+        return None
+
+def save_transcript(user_name, prob, chat_history, solved, score, path=None):
+    """Appends one submitted session to the transcript JSONL (no-op unless configured)."""
+    path = path or TRANSCRIPTS_PATH
+    if not path or not prob:
+        return
+    record = {
+        "session_id": uuid.uuid4().hex,
+        "timestamp": time.time(),
+        "user": user_name,
+        "problem_id": prob["id"],
+        "variant_seed": prob.get("variant_seed"),
+        # What the student actually saw, so re-grading does not depend on today's templates
+        "variant_params": prob.get("variant_params"),
+        "statement": prob.get("statement", ""),
+        "targets": prob.get("targets", {}),
+        "category": prob.get("category", ""),
+        "history": [{"role": r, "text": t} for r, t in history_turns(chat_history)],
+        "solved": sorted(solved or ()),
+        "score": score,
+    }
+    try:
+        with _transcript_lock, open(path, "a") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Transcript save failed: {e}")
+
+def evaluate_understanding_score(chat_history, prob=None, solved=None):
+    """대화 내용을 바탕으로 이해도를 0-10점으로 평가합니다. 명확한 경우 로컬 점수를 사용합니다."""
+    local_score, _ = local_understanding_score(chat_history, prob, solved)
+    if local_score is not None and not SCORE_SHADOW:
+        count("tutor_score_total", source="local")
+        return local_score
+
+    score = llm_understanding_score(chat_history)
+    if local_score is None:
+        count("tutor_score_total", source="llm" if score is not None else "llm_failed")
+        return score if score is not None else 0
+    count("tutor_score_total", source="local")
+    if score is not None:
+        count("tutor_score_agreement_total", diff=abs(score - local_score))
+    return local_score
 
-def analyze_and_send_report(user_name, topic_title, chat_history):
+def analyze_and_send_report(user_name, topic_title, chat_history, prob=None, solved=None):
     """세션을 분석하여 이메일 리포트를 전송합니다."""
-    score = evaluate_understanding_score(chat_history)
+    score = evaluate_understanding_score(chat_history, prob, solved)
+    save_transcript(user_name, prob, chat_history, solved, score)
     
     report_instruction = (
         "You are an expert Engineering Education Evaluator for Dr. Dugan Um at TAMUCC. "
@@ -181,7 +317,9 @@ def analyze_and_send_report(user_name, topic_title, chat_history):
     )
     
     try:
-        response = model.generate_content(prompt)
+        with span("gemini.generate_content.report"):
+            response = model.generate_content(prompt)
+        record_usage("gemini.generate_content.report", response)
         report_text = response.text
     except Exception as e:
         report_text = f"Analysis failed: {str(e)}"
@@ -198,10 +336,11 @@ def analyze_and_send_report(user_name, topic_title, chat_history):
         msg['Subject'] = f"Eng. Tutor ({user_name}): {topic_title} [Score: {score}/10]"
         msg.attach(MIMEText(report_text, 'plain'))
 
-        server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
-        server.login(sender, password)
-        server.send_message(msg)
-        server.quit()
+        with span("smtp.send"):
+            server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
+            server.login(sender, password)
+            server.send_message(msg)
+            server.quit()
     except Exception as e:
         print(f"SMTP Error: {e}")
     
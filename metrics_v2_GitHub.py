@@ -0,0 +1,247 @@
+import bisect
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Environment switches (all optional):
+#   TUTOR_METRICS=0               -> disable recording entirely
+#   TUTOR_METRICS_PORT=9100       -> serve Prometheus text at http://<host>:<port>/metrics
+#   TUTOR_METRICS_HOST=127.0.0.1  -> bind address of that endpoint (unauthenticated; widen only behind a firewall)
+#   TUTOR_METRICS_JSON=path.json  -> periodic JSON dump (every TUTOR_METRICS_INTERVAL seconds, default 60)
+#   TUTOR_PROFILE_RATE=0.01       -> run that fraction of spans under cProfile (stats in <json>.prof)
+ENABLED = os.environ.get("TUTOR_METRICS", "1") != "0"
+PROFILE_RATE = float(os.environ.get("TUTOR_PROFILE_RATE", "0") or 0)
+
+# Histogram bucket upper bounds in seconds (Prometheus 'le' labels)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_histograms = {}  # span name -> {"buckets": [...], "sum": float, "count": int}
+_counters = {}    # (metric name, sorted label items) -> value
+_profile_stats = None
+_profiling = False
+_exporter_started = False
+
+
+def observe(name, seconds):
+    """Adds one duration sample (seconds) to the histogram of a span."""
+    if not ENABLED:
+        return
+    idx = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0}
+        h["buckets"][idx] += 1
+        h["sum"] += seconds
+        h["count"] += 1
+
+
+def count(name, value=1, **labels):
+    """Increments a labelled counter, e.g. count('tutor_cache_total', cache='variants', result='hit')."""
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def record_cache(cache, hit):
+    """Counts one cache lookup as a hit or a miss."""
+    count("tutor_cache_total", cache=cache, result="hit" if hit else "miss")
+
+
+def record_usage(name, response):
+    """Records Gemini token counts from a response's usage_metadata, when present."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+        tokens = getattr(usage, attr, None)
+        if tokens:
+            count("tutor_tokens_total", tokens, span=name, kind=kind)
+
+
+def _start_profile():
+    """Starts a cProfile sampler for this span if the sampling rate says so."""
+    global _profiling
+    if PROFILE_RATE <= 0 or random.random() >= PROFILE_RATE:
+        return None
+    with _lock:
+        if _profiling:  # cProfile cannot nest; skip inner/concurrent spans
+            return None
+        _profiling = True
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:  # another profiler is already active
+        with _lock:
+            _profiling = False
+        return None
+    return prof
+
+
+def _stop_profile(prof):
+    global _profiling, _profile_stats
+    prof.disable()
+    with _lock:
+        if _profile_stats is None:
+            _profile_stats = pstats.Stats(prof)
+        else:
+            _profile_stats.add(prof)
+        _profiling = False
+
+
+@contextmanager
+def span(name):
+    """Times the enclosed block and records it under the given span name."""
+    if not ENABLED:
+        yield
+        return
+    prof = _start_profile()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+        if prof is not None:
+            _stop_profile(prof)
+
+
+def traced(name=None):
+    """Decorator form of span(); the span name defaults to the function name."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Returns a JSON-serialisable copy of all histograms and counters."""
+    with _lock:
+        spans = {
+            n: {"buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h["buckets"])),
+                "sum": h["sum"], "count": h["count"]}
+            for n, h in _histograms.items()
+        }
+        counters = [
+            {"name": n, "labels": dict(labels), "value": v}
+            for (n, labels), v in _counters.items()
+        ]
+    return {"timestamp": time.time(), "spans": spans, "counters": counters}
+
+
+def _fmt_labels(labels):
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels)
+
+
+def export_prometheus():
+    """Renders all metrics in the Prometheus text exposition format."""
+    lines = ["# TYPE tutor_span_seconds histogram"]
+    with _lock:
+        for n, h in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, c in zip(list(BUCKETS) + ["+Inf"], h["buckets"]):
+                cumulative += c
+                lines.append(f'tutor_span_seconds_bucket{{span="{n}",le="{bound}"}} {cumulative}')
+            lines.append(f'tutor_span_seconds_sum{{span="{n}"}} {h["sum"]:.6f}')
+            lines.append(f'tutor_span_seconds_count{{span="{n}"}} {h["count"]}')
+        declared = set()
+        for (n, labels), v in sorted(_counters.items()):
+            if n not in declared:
+                lines.append(f"# TYPE {n} counter")
+                declared.add(n)
+            lines.append(f"{n}{{{_fmt_labels(labels)}}} {v}")
+    return "\n".join(lines) + "\n"
+
+
+def profile_report(limit=30):
+    """Returns the top functions (by cumulative time) from sampled spans."""
+    with _lock:
+        if _profile_stats is None:
+            return "No profile samples collected."
+        out = io.StringIO()
+        _profile_stats.stream = out
+        _profile_stats.sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def dump_json(path):
+    """Writes snapshot() to path atomically, plus sampled cProfile stats if any."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+    os.replace(tmp, path)
+    with _lock:
+        if _profile_stats is not None:
+            _profile_stats.dump_stats(f"{path}.prof")
+
+
+def reset():
+    """Clears all recorded metrics and profile samples."""
+    global _profile_stats
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _profile_stats = None
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = export_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _dump_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            dump_json(path)
+        except OSError as e:
+            print(f"Metrics dump failed: {e}")
+
+
+def start_exporter():
+    """Starts the /metrics endpoint and/or JSON dumper once per process, as configured by env."""
+    global _exporter_started
+    with _lock:
+        if _exporter_started or not ENABLED:
+            return
+        _exporter_started = True
+
+    port = os.environ.get("TUTOR_METRICS_PORT")
+    if port:
+        try:
+            host = os.environ.get("TUTOR_METRICS_HOST", "127.0.0.1")
+            server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, daemon=True, name="tutor-metrics-http").start()
+        except OSError as e:
+            print(f"Metrics endpoint unavailable: {e}")
+
+    json_path = os.environ.get("TUTOR_METRICS_JSON")
+    if json_path:
+        interval = float(os.environ.get("TUTOR_METRICS_INTERVAL", "60"))
+        threading.Thread(target=_dump_loop, args=(json_path, interval), daemon=True, name="tutor-metrics-json").start()
@@ -0,0 +1,263 @@
+"""Offline batch re-grading of stored session transcripts.
+
+Usage:
+    python regrade_v2_GitHub.py transcripts.jsonl --out regrade.csv [--workers 8]
+        [--rubric new_rubric.txt] [--shadow] [--stub 5] [--summary]
+
+Transcripts are the JSONL records written by logic_v2_GitHub.save_transcript
+(set TUTOR_TRANSCRIPTS in the app). Each record carries the targets the student
+was graded against; records from before that field existed fall back to
+regenerating the variant from its seed, which is only faithful while the
+template is unchanged. Each session gets target detection
+(check_numeric_match over the student's turns), the local pre-scorer and, for
+ambiguous sessions (or all of them with --shadow), a Gemini score using the
+given rubric. With --rubric every session is scored by Gemini, since the local
+scorer only knows the built-in rubric. Rows are appended to the output as they
+finish, so an interrupted run resumes where it stopped; sessions whose Gemini
+call failed get no row and are retried by the next run. A .parquet output is written via a CSV checkpoint
+and converted at the end (requires pyarrow).
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from variants_v2_GitHub import variant_problem
+from logic_v2_GitHub import (
+    SCORE_INSTRUCTION, check_numeric_match, get_gemini_model, llm_understanding_score,
+    load_problems, local_understanding_score, history_turns,
+)
+
+COLUMNS = [
+    "session_id", "user", "problem_id", "category", "turns", "latex", "equations",
+    "solved", "n_targets", "local_score", "llm_score", "score",
+]
+
+
+class StubModel:
+    """Stands in for a Gemini model: always answers with a fixed score."""
+
+    class _Response:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self, score):
+        self.score = score
+
+    def generate_content(self, prompt):
+        return self._Response(str(self.score))
+
+
+def iter_transcripts(paths):
+    """Streams transcript records from one or more JSONL files."""
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def detect_solved(history, prob):
+    """Re-runs the app's target detection over every student turn."""
+    solved = set()
+    for role, text in history_turns(history):
+        if role != "user":
+            continue
+        for target, val in prob.get("targets", {}).items():
+            if target not in solved and check_numeric_match(text, val):
+                solved.add(target)
+    return solved
+
+
+def grade(record, prob, model, shadow, use_local=True):
+    """Grades one session; returns an output row, or None if a needed Gemini score failed.
+
+    With use_local=False the local score is still reported but Gemini's score is used.
+    """
+    history = record.get("history", [])
+    solved = detect_solved(history, prob)
+    local, feats = local_understanding_score(history, prob, solved)
+    ask_llm = local is None or shadow or not use_local
+    llm = llm_understanding_score(history, model) if ask_llm else None
+    if ask_llm and llm is None:
+        return None
+    return {
+        "session_id": record["session_id"],
+        "user": record.get("user", ""),
+        "problem_id": prob["id"],
+        "category": prob.get("category", ""),
+        "turns": feats["turns"],
+        "latex": feats["latex"],
+        "equations": feats["equations"],
+        "solved": len(solved),
+        "n_targets": len(prob.get("targets", {})),
+        "local_score": "" if local is None else local,
+        "llm_score": "" if llm is None else llm,
+        "score": local if local is not None and use_local else llm,
+    }
+
+
+def truncate_partial_row(path):
+    """Drops a last row cut short by a crash mid-write, so appended rows start on a fresh line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def session_problem(record, problems):
+    """The problem as the student saw it: stored targets, else the seed's variant (older records)."""
+    pid = record.get("problem_id")
+    prob = problems.get(pid)
+    if record.get("targets"):
+        base = prob or {"id": pid, "category": record.get("category", "")}
+        return dict(base, statement=record.get("statement") or base.get("statement", ""),
+                    targets=record["targets"], variant_seed=record.get("variant_seed"),
+                    variant_params=record.get("variant_params"))
+    if prob is not None and record.get("variant_seed") is not None:
+        variant = variant_problem(prob, record["variant_seed"])
+        # Template no longer fits: grading against the published answer would mark correct work unsolved
+        return variant if "variant_seed" in variant else None
+    return prob
+
+
+def done_session_ids(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as f:
+        return {row["session_id"] for row in csv.DictReader(f)}
+
+
+async def regrade(records, problems, model, out_csv, workers, shadow, use_local=True):
+    """Grades records with at most `workers` in flight, appending rows to out_csv."""
+    truncate_partial_row(out_csv)
+    done = done_session_ids(out_csv)
+    new_file = not os.path.exists(out_csv) or os.path.getsize(out_csv) == 0
+    sem = asyncio.Semaphore(workers)
+    pending = set()
+    graded = skipped = failed = 0
+    loop = asyncio.get_running_loop()
+
+    # Own pool: asyncio.to_thread's default executor caps at min(32, cpus + 4) threads
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="regrade") as pool, \
+            open(out_csv, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if new_file:
+            writer.writeheader()
+
+        async def run(record, prob):
+            nonlocal graded, failed
+            try:
+                row = await loop.run_in_executor(pool, grade, record, prob, model, shadow, use_local)
+                if row is None:
+                    failed += 1
+                    return
+                writer.writerow(row)
+                f.flush()
+                graded += 1
+            finally:
+                sem.release()
+
+        for record in records:
+            prob = session_problem(record, problems)
+            if record.get("session_id") in done or prob is None:
+                skipped += 1
+                continue
+            await sem.acquire()  # bounds both concurrency and memory while streaming
+            task = asyncio.create_task(run(record, prob))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+    return graded, skipped, failed
+
+
+def to_parquet(csv_path, out_path):
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+    pq.write_table(pacsv.read_csv(csv_path), out_path, compression="zstd")
+
+
+def summarize(csv_path):
+    """Prints per-problem and per-category aggregates plus local/LLM scorer statistics."""
+    by_problem = defaultdict(list)
+    by_category = defaultdict(list)
+    n = local_n = 0
+    diffs = []
+    with open(csv_path, newline="") as f:
+        for row in csv.DictReader(f):
+            score = int(row["score"])
+            solved_frac = int(row["solved"]) / max(int(row["n_targets"]), 1)
+            by_problem[row["problem_id"]].append((score, solved_frac))
+            by_category[row["category"]].append((score, solved_frac))
+            n += 1
+            if row["local_score"] != "":
+                local_n += 1
+                if row["llm_score"] != "":
+                    diffs.append(abs(int(row["local_score"]) - int(row["llm_score"])))
+
+    for title, groups in (("Problem", by_problem), ("Category", by_category)):
+        print(f"\n{title:<48} {'n':>5} {'mean score':>10} {'solved':>7}")
+        for key in sorted(groups):
+            vals = groups[key]
+            mean = sum(v[0] for v in vals) / len(vals)
+            solved = sum(v[1] for v in vals) / len(vals)
+            print(f"{key:<48} {len(vals):>5} {mean:>10.2f} {solved:>6.0%}")
+
+    if n:
+        print(f"\nLocal scorer confident on {local_n}/{n} sessions ({local_n / n:.0%} of LLM calls avoidable)")
+    if diffs:
+        within1 = sum(1 for d in diffs if d <= 1) / len(diffs)
+        print(f"Agreement with Gemini on {len(diffs)} shadowed sessions: "
+              f"mean |diff| {sum(diffs) / len(diffs):.2f}, within 1 point {within1:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-grade stored tutor transcripts.")
+    parser.add_argument("transcripts", nargs="+", help="transcript JSONL file(s)")
+    parser.add_argument("--out", default="regrade.csv", help=".csv or .parquet")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent gradings")
+    parser.add_argument("--rubric", help="text file with an updated scoring instruction (scores every session with Gemini)")
+    parser.add_argument("--shadow", action="store_true", help="also ask the model when the local scorer is confident")
+    parser.add_argument("--stub", type=int, metavar="SCORE", help="use a stub model returning SCORE (no API calls)")
+    parser.add_argument("--summary", action="store_true", help="print aggregates when done")
+    args = parser.parse_args()
+
+    if args.stub is not None:
+        model = StubModel(args.stub)
+    else:
+        instruction = SCORE_INSTRUCTION
+        if args.rubric:
+            with open(args.rubric) as f:
+                instruction = f.read()
+        model = get_gemini_model(instruction)
+        if model is None:
+            sys.exit("Gemini model unavailable (check GEMINI_API_KEY in .streamlit/secrets.toml)")
+
+    parquet = args.out.endswith(".parquet")
+    out_csv = f"{args.out}.partial.csv" if parquet else args.out
+    problems = {p["id"]: p for p in load_problems()}
+
+    # The local scorer encodes the built-in rubric, so a new rubric must not be short-circuited
+    use_local = not args.rubric
+    graded, skipped, failed = asyncio.run(
+        regrade(iter_transcripts(args.transcripts), problems, model, out_csv, args.workers, args.shadow, use_local)
+    )
+    print(f"Graded {graded} sessions ({skipped} skipped: already done, unknown problem or unrecoverable variant) -> {out_csv}")
+    if failed:
+        print(f"{failed} sessions got no Gemini score and were not written; run again to retry them")
+
+    if parquet:
+        to_parquet(out_csv, args.out)
+        print(f"Wrote {args.out}")
+    if args.summary:
+        summarize(out_csv)
+
+
+if __name__ == "__main__":
+    main()
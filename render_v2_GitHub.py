@@ -1,9 +1,116 @@
-import matplotlib.pyplot as plt
-import numpy as np
 import os
 import io
 import re
+import threading
+from metrics_v2_GitHub import traced
 
+# matplotlib/numpy are imported on first render so pages without plots start fast
+_plt = None
+_np = None
+_preload_started = False
+
+def _mpl():
+    """Imports pyplot and numpy once, forcing the non-interactive Agg backend."""
+    global _plt, _np
+    if _plt is None:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import numpy as np
+        _plt, _np = plt, np
+    return _plt, _np
+
+def preload():
+    """Starts importing pyplot/numpy in a background thread, once per process."""
+    global _preload_started
+    if _preload_started: return
+    _preload_started = True
+    threading.Thread(target=_mpl, daemon=True).start()
+
+def warm_up():
+    """Pre-builds the matplotlib font cache and mathtext parser; run once at build/deploy time."""
+    plt, _ = _mpl()
+    fig, ax = plt.subplots(figsize=(1, 1), dpi=50)
+    ax.set_title(r"$\vec{v}_A = \omega \times r$")
+    fig.savefig(io.BytesIO(), format='png')
+    plt.close(fig)
+
+def _image_candidates(pid, prob):
+    """Returns the image paths to try for a problem, in order: HW folder, then images/<id>.png."""
+    hw_title = prob.get("hw_title")
+    hw_subtitle = prob.get("hw_subtitle")
+    category = str(prob.get("category", "")).lower()
+        
+    folder_name = None
+        
+    # Mapping for Homework Folders
+    if "kinetics of rigid body: general motion" in category:
+        folder_name = "HW 15 (kinetics of rigid bodies-general motion)"
+        if pid == "RB_K_3.1": image_filename = "78.png"
+        elif pid == "RB_K_3.2": image_filename = "87.png"
+        elif pid == "RB_K_3.3": image_filename = "97.png"
+        else: image_filename = f"{pid.split('_')[-1]}.png" if "_" in pid else f"{pid}.png"
+    elif "kinetics of rigid body: rotation" in category:
+        folder_name = "HW 14 (kinetics of rigid bodies-rotation)"
+        if pid == "RB_K_2.1": image_filename = "60.png"
+        elif pid == "RB_K_2.2": image_filename = "33.png"
+        elif pid == "RB_K_2.3": image_filename = "38.png"
+        else: image_filename = f"{pid.split('_')[-1]}.png" if "_" in pid else f"{pid}.png"
+    elif "kinetics of rigid body: translation" in category:
+        folder_name = "HW 13 (kinetics of rigid bodies-translation)"
+        if pid == "RB_K_1.1": image_filename = "22.png"
+        elif pid == "RB_K_1.2": image_filename = "6.png"
+        elif pid == "RB_K_1.3": image_filename = "9.png"
+        else: image_filename = f"{pid.split('_')[-1]}.png" if "_" in pid else f"{pid}.png"
+    elif "relative acceleration" in category:
+        folder_name = "HW 12 (kinematics of rigid body-relative acceleration)"
+        image_filename = f"{pid.split('_')[-1]}.png"
+    elif "instantaneous velocity" in category:
+        folder_name = "HW 11-3 (kinematics of rigid body-Instantaneous velocity)"
+        image_filename = f"{pid.split('_')[-1]}.png"
+    elif "relative velocity" in category:
+        folder_name = "HW 11-2 (kinematics of rigid body-relative velocity)"
+        image_filename = f"{pid.split('_')[-1]}.png"
+    elif "rotation" in category:
+        folder_name = "HW 11 (kinematics of rigid body-rotation)"
+        if "2.6_1" in pid: image_filename = "18.png"
+        elif "2.6_2" in pid: image_filename = "6.png"
+        elif "2.6_3" in pid: image_filename = "16.png"
+        else: image_filename = f"{pid.split('_')[-1]}.png" if "_" in pid else f"{pid}.png"
+    elif "impact" in category or pid in ["239", "243", "249", "252"]:
+        folder_name = "HW 10 (Impact)"
+        image_filename = f"{pid}.png"
+    elif any(x in category for x in ["momentum", "impulse"]) or pid in ["176", "198", "209"]:
+        folder_name = "HW 9 (Impuls and momentum)"
+        image_filename = f"{pid}.png"
+    elif "work" in category or "energy" in category or pid in ["141", "158", "161", "162"]:
+        folder_name = "HW 8 (work and energy)"
+        image_filename = f"{pid}.png"
+    elif hw_title and hw_subtitle:
+        if hw_title == "HW 7":
+            folder_name = f"HW 7  ({hw_subtitle})" 
+        else:
+            folder_name = f"{hw_title} ({hw_subtitle})"
+        image_filename = f"{pid.split('_')[-1]}.png"
+
+    candidates = []
+    if folder_name:
+        candidates.append(os.path.join('images', folder_name, 'images', image_filename))
+    clean_name = pid.replace("_", "").replace(".", "").lower()
+    candidates.append(os.path.join('images', f'{clean_name}.png'))
+    return candidates
+
+def problem_image_path(prob):
+    """Returns the on-disk diagram image for a problem, or None for procedural/missing diagrams."""
+    pid = str(prob.get('id', '')).strip()
+    if pid.startswith("S_1."):
+        return None
+    for img_path in _image_candidates(pid, prob):
+        if os.path.exists(img_path):
+            return img_path
+    return None
+
+@traced("render_problem_diagram")
 def render_problem_diagram(prob):
     """
     Generates procedural FBDs for Statics or loads external images for Dynamics.
@@ -17,6 +124,7 @@ def render_problem_diagram(prob):
         pid = str(prob).strip()
         prob = {}
 
+    plt, np = _mpl()
     fig, ax = plt.subplots(figsize=(4, 3), dpi=100)
     ax.set_aspect('equal')
     found = False
@@ -117,86 +225,18 @@ def render_problem_diagram(prob):
 
     # --- 2. HW Directory Image Loader (Nested Path Logic) ---
     if not found:
-        hw_title = prob.get("hw_title")
-        hw_subtitle = prob.get("hw_subtitle")
-        category = str(prob.get("category", "")).lower()
-        
-        folder_name = None
-        
-        # Mapping for Homework Folders
-        if "kinetics of rigid body: general motion" in category:
-            folder_name = "HW 15 (kinetics of rigid bodies-general motion)"
-            if pid == "RB_K_3.1": image_filename = "78.png"
-            elif pid == "RB_K_3.2": image_filename = "87.png"
-            elif pid == "RB_K_3.3": image_filename = "97.png"
-            else: image_filename = f"{pid.split('_')[-1]}.png" if "_" in pid else f"{pid}.png"
-        elif "kinetics of rigid body: rotation" in category:
-            folder_name = "HW 14 (kinetics of rigid bodies-rotation)"
-            if pid == "RB_K_2.1": image_filename = "60.png"
-            elif pid == "RB_K_2.2": image_filename = "33.png"
-            elif pid == "RB_K_2.3": image_filename = "38.png"
-            else: image_filename = f"{pid.split('_')[-1]}.png" if "_" in pid else f"{pid}.png"
-        elif "kinetics of rigid body: translation" in category:
-            folder_name = "HW 13 (kinetics of rigid bodies-translation)"
-            if pid == "RB_K_1.1": image_filename = "22.png"
-            elif pid == "RB_K_1.2": image_filename = "6.png"
-            elif pid == "RB_K_1.3": image_filename = "9.png"
-            else: image_filename = f"{pid.split('_')[-1]}.png" if "_" in pid else f"{pid}.png"
-        elif "relative acceleration" in category:
-            folder_name = "HW 12 (kinematics of rigid body-relative acceleration)"
-            image_filename = f"{pid.split('_')[-1]}.png"
-        elif "instantaneous velocity" in category:
-            folder_name = "HW 11-3 (kinematics of rigid body-Instantaneous velocity)"
-            image_filename = f"{pid.split('_')[-1]}.png"
-        elif "relative velocity" in category:
-            folder_name = "HW 11-2 (kinematics of rigid body-relative velocity)"
-            image_filename = f"{pid.split('_')[-1]}.png"
-        elif "rotation" in category:
-            folder_name = "HW 11 (kinematics of rigid body-rotation)"
-            if "2.6_1" in pid: image_filename = "18.png"
-            elif "2.6_2" in pid: image_filename = "6.png"
-            elif "2.6_3" in pid: image_filename = "16.png"
-            else: image_filename = f"{pid.split('_')[-1]}.png" if "_" in pid else f"{pid}.png"
-        elif "impact" in category or pid in ["239", "243", "249", "252"]:
-            folder_name = "HW 10 (Impact)"
-            image_filename = f"{pid}.png"
-        elif any(x in category for x in ["momentum", "impulse"]) or pid in ["176", "198", "209"]:
-            folder_name = "HW 9 (Impuls and momentum)"
-            image_filename = f"{pid}.png"
-        elif "work" in category or "energy" in category or pid in ["141", "158", "161", "162"]:
-            folder_name = "HW 8 (work and energy)"
-            image_filename = f"{pid}.png"
-        elif hw_title and hw_subtitle:
-            if hw_title == "HW 7":
-                folder_name = f"HW 7  ({hw_subtitle})" 
-            else:
-                folder_name = f"{hw_title} ({hw_subtitle})"
-            image_filename = f"{pid.split('_')[-1]}.png"
-
-        if folder_name:
-            img_path = os.path.join('images', folder_name, 'images', image_filename)
+        for img_path in _image_candidates(pid, prob):
+            if not os.path.exists(img_path):
+                continue
             try:
-                if os.path.exists(img_path):
-                    img = plt.imread(img_path)
-                    ax.imshow(img)
-                    h, w = img.shape[:2]
-                    ax.set_xlim(0, w); ax.set_ylim(h, 0)
-                    found = True
+                img = plt.imread(img_path)
+                ax.imshow(img)
+                h, w = img.shape[:2]
+                ax.set_xlim(0, w); ax.set_ylim(h, 0)
+                found = True
+                break
             except Exception:
                 pass
-        
-        if not found:
-            clean_name = pid.replace("_", "").replace(".", "").lower()
-            img_path_alt = os.path.join('images', f'{clean_name}.png')
-            if os.path.exists(img_path_alt):
-                try:
-                    img = plt.imread(img_path_alt)
-                    ax.imshow(img)
-                    h, w = img.shape[:2]
-                    ax.set_xlim(0, w); ax.set_ylim(h, 0)
-                    found = True
-                except Exception:
-                    pass
 
     # --- 3. Error Handling ---
     if not found:
@@ -216,8 +256,10 @@ def render_problem_diagram(prob):
     buf.seek(0)
     return buf
 
+@traced("render_lecture_visual")
 def render_lecture_visual(topic, params=None):
     """Visualizes derivation components with a strictly centered origin."""
+    plt, np = _mpl()
     fig, ax = plt.subplots(figsize=(6, 6), dpi=150)
     if params is None: params = {}
     
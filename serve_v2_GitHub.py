@@ -0,0 +1,15 @@
+"""Production entry point: the tutor app plus long-lived cache headers for diagram assets.
+
+Run with:
+    streamlit run serve_v2_GitHub.py
+
+Streamlit picks up the `app` object below and serves Dynamics_tutor_v2_GitHub.py
+unchanged; the only difference from running that script directly is that the
+hash-named files under app/static/diagrams/ are sent with
+`Cache-Control: public, max-age=31536000, immutable`.
+"""
+import streamlit as st
+from starlette.middleware import Middleware
+from assets_v2_GitHub import ImmutableAssets
+
+app = st.App("Dynamics_tutor_v2_GitHub.py", middleware=[Middleware(ImmutableAssets)])
@@ -0,0 +1,20 @@
+import os
+import sys
+import pytest
+
+# The app modules live at the repository root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import catalog_v2_GitHub as catalog  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def repo_catalog(tmp_path_factory):
+    """Runs from the repo root (load_problems reads its JSON relative to the app) with the catalog in a temp dir."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(REPO_ROOT)
+        mp.setattr(catalog, "CATALOG_PATH", str(tmp_path_factory.mktemp("catalog") / "problems_v2_GitHub.db"))
+        catalog.close_catalog()
+        yield
+        catalog.close_catalog()
@@ -0,0 +1,79 @@
+"""Catalog search terms and rebuilds while the app keeps running."""
+import json
+import os
+import pytest
+import catalog_v2_GitHub as catalog
+import logic_v2_GitHub as logic
+
+
+@pytest.fixture
+def live_catalog(tmp_path, monkeypatch):
+    """A catalog whose single source is a JSON list that the test can rewrite."""
+    source = tmp_path / "problems.json"
+    monkeypatch.setattr(logic, "load_problems", lambda: json.loads(source.read_text()))
+
+    def write(problems):
+        source.write_text(json.dumps(problems))
+        st = os.stat(source)
+        os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))  # coarse-mtime filesystems
+
+    yield write, str(tmp_path / "problems.db"), (str(source),)
+    catalog.close_catalog()
+
+
+PROBLEMS = [
+    {"id": "K_2.6_3", "category": "Rigid Body Kinematics (Rotation)", "statement": "The arm spins up.", "targets": {"t": 0.1784}},
+    {"id": "176", "category": "Impulse and Momentum", "statement": r"Find $|\Delta E|$ for the 0.9 m drop.", "targets": {"n": 99.85}},
+    {"id": "K_2.2_1", "category": "Rigid Body Kinematics (Rotation)", "statement": "A wheel turns.", "targets": {"w": 1}},
+]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("K_2.6_3", ["K_2.6_3"]),
+    ("k_2.6", ["K_2.6_3"]),
+    ("2.6", ["K_2.6_3"]),
+    ("K_2", ["K_2.2_1", "K_2.6_3"]),
+    ("Δ", ["176"]),
+    ("ΔE", ["176"]),
+    ("0.9", ["176"]),
+    ("the", []),
+    ("?!", []),
+    ("", ["176", "K_2.6_3", "K_2.2_1"]),
+])
+def test_search_terms(live_catalog, query, expected):
+    write, db, sources = live_catalog
+    write(PROBLEMS)
+    catalog.open_catalog(db, sources)
+    rows, total = catalog.search(query)
+    assert sorted(r[0] for r in rows) == sorted(expected)
+    assert total == len(expected)
+
+
+def test_source_change_rebuilds_without_restart(live_catalog):
+    write, db, sources = live_catalog
+    write(PROBLEMS[:1])
+    catalog.open_catalog(db, sources)
+    assert catalog.search("")[1] == 1
+    assert catalog.get_problem("176") is None
+
+    write(PROBLEMS)
+    assert catalog.search("")[1] == 1  # the old file is served while the rebuild runs
+    catalog.wait_for_rebuild()
+    assert catalog.search("")[1] == 3
+    assert catalog.get_problem("176")["targets"] == {"n": 99.85}
+    assert not [f for f in os.listdir(os.path.dirname(db)) if f.endswith(".tmp")]
+
+
+def test_failed_rebuild_keeps_serving_old_catalog(live_catalog, monkeypatch):
+    write, db, sources = live_catalog
+    write(PROBLEMS[:1])
+    catalog.open_catalog(db, sources)
+
+    def broken():
+        raise ValueError("bad JSON")
+    monkeypatch.setattr(logic, "load_problems", broken)
+    write(PROBLEMS)
+    assert catalog.search("")[1] == 1
+    catalog.wait_for_rebuild()
+    assert catalog.search("")[1] == 1
+    assert catalog._rebuild_thread is None  # not retried for the same sources
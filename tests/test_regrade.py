@@ -0,0 +1,93 @@
+"""Resume and rubric behaviour of the offline re-grader."""
+import asyncio
+import csv
+import threading
+import regrade_v2_GitHub as regrade
+import variants_v2_GitHub as variants
+
+PROB = {"id": "K_2.6_3", "category": "Rigid Body Kinematics (Rotation)", "targets": {"t": 0.1784}}
+AMBIGUOUS = {"session_id": "a", "problem_id": "K_2.6_3",
+             "history": [{"role": "user", "text": "I think t = 0.178 s"}] * 3}
+CONFIDENT = {"session_id": "b", "problem_id": "K_2.6_3", "history": [{"role": "user", "text": "no idea"}]}
+
+
+def run(tmp_path, model, records, **kwargs):
+    out = tmp_path / "regrade.csv"
+    result = asyncio.run(regrade.regrade(iter(records), {"K_2.6_3": PROB}, model, str(out), 2, False, **kwargs))
+    with open(out, newline="") as f:
+        return result, {row["session_id"]: row for row in csv.DictReader(f)}
+
+
+def test_failed_llm_score_writes_no_row_and_is_retried(tmp_path):
+    (graded, skipped, failed), rows = run(tmp_path, regrade.StubModel("unavailable"), [AMBIGUOUS, CONFIDENT])
+    assert (graded, failed) == (1, 1)
+    assert set(rows) == {"b"}
+
+    (graded, skipped, failed), rows = run(tmp_path, regrade.StubModel(6), [AMBIGUOUS, CONFIDENT])
+    assert (graded, skipped, failed) == (1, 1, 0)
+    assert rows["a"]["score"] == "6"
+
+
+def test_new_rubric_bypasses_local_scorer(tmp_path):
+    _, rows = run(tmp_path, regrade.StubModel(9), [CONFIDENT], use_local=False)
+    assert rows["b"]["local_score"] == "1"
+    assert rows["b"]["score"] == "9"
+
+
+def test_resume_after_crash_mid_row(tmp_path):
+    _, rows = run(tmp_path, regrade.StubModel(6), [AMBIGUOUS])
+    out = tmp_path / "regrade.csv"
+    with open(out, "a", newline="") as f:
+        f.write("b,,K_2.6_3,Rigid")  # row cut short by a crash
+    (graded, skipped, failed), rows = run(tmp_path, regrade.StubModel(6), [AMBIGUOUS, CONFIDENT])
+    assert (graded, skipped) == (1, 1)
+    assert rows["b"]["score"] == "1" and rows["a"]["score"] == "6"
+
+
+class BarrierModel(regrade.StubModel):
+    """Answers only once `parties` calls are in flight at the same time."""
+
+    def __init__(self, parties):
+        super().__init__(5)
+        self.barrier = threading.Barrier(parties, timeout=10)
+
+    def generate_content(self, prompt):
+        self.barrier.wait()
+        return super().generate_content(prompt)
+
+
+def test_workers_beyond_default_executor_size(tmp_path):
+    workers = 48  # more than asyncio's default executor allows on small machines
+    records = [dict(AMBIGUOUS, session_id=str(i)) for i in range(workers)]
+    out = tmp_path / "regrade.csv"
+    graded, _, failed = asyncio.run(regrade.regrade(iter(records), {"K_2.6_3": PROB}, BarrierModel(workers), str(out), workers, False))
+    assert (graded, failed) == (workers, 0)
+
+
+def test_stored_targets_win_over_current_templates():
+    from catalog_v2_GitHub import get_problem
+    problems = {"K_2.6_3": get_problem("K_2.6_3")}
+    record = dict(AMBIGUOUS, variant_seed=7, targets={"t": 0.25}, statement="as seen")
+    prob = regrade.session_problem(record, problems)
+    assert prob["targets"] == {"t": 0.25} and prob["statement"] == "as seen"
+    # Older records without targets are rebuilt from the seed
+    old = regrade.session_problem(dict(AMBIGUOUS, variant_seed=7), problems)
+    assert old["variant_seed"] == 7 and old["targets"] != problems["K_2.6_3"]["targets"]
+    # ... unless the template no longer fits, which cannot be graded faithfully
+    reworded = {"K_2.6_3": dict(problems["K_2.6_3"], statement="Reworded.")}
+    variants._cache.clear()
+    assert regrade.session_problem(dict(AMBIGUOUS, variant_seed=7), reworded) is None
+
+
+def test_saved_transcript_round_trips_variant(tmp_path):
+    import json
+    from catalog_v2_GitHub import get_problem
+    from logic_v2_GitHub import save_transcript
+    from variants_v2_GitHub import variant_problem
+    variant = variant_problem(get_problem("K_2.6_3"), 99)
+    path = tmp_path / "t.jsonl"
+    save_transcript("Ann", variant, [{"role": "user", "text": "hi"}], set(), 1, path=str(path))
+    record = json.loads(path.read_text())
+    assert record["targets"] == variant["targets"]
+    assert record["variant_params"] == variant["variant_params"]
+    assert regrade.session_problem(record, {})["targets"] == variant["targets"]
@@ -0,0 +1,80 @@
+"""Thresholds of the local pre-scorer (logic_v2_GitHub.local_understanding_score)."""
+import pytest
+import logic_v2_GitHub as logic
+import metrics_v2_GitHub as metrics
+
+ROTATION = {"id": "K_2.6_3", "category": "Rigid Body Kinematics (Rotation)", "targets": {"t": 0.1784}}
+IMPACT = {"id": "239", "category": "Impact", "targets": {"e": 0.82, "n": 33.3}}
+
+
+def session(*texts):
+    history = []
+    for text in texts:
+        history += [{"role": "user", "text": text}, {"role": "model", "text": "..."}]
+    return history
+
+
+def test_no_turns_scores_zero():
+    assert logic.local_understanding_score([], ROTATION, set())[0] == 0
+
+
+@pytest.mark.parametrize("turns", [1, 2])
+def test_barely_participated_scores_turn_count(turns):
+    score, feats = logic.local_understanding_score(session(*["no idea"] * turns), ROTATION, set())
+    assert score == turns
+    assert feats["equations"] == 0
+
+
+def test_bare_symbols_are_not_equations():
+    history = session(r"is it $\omega$ or $\alpha$? t = 0.178")
+    score, feats = logic.local_understanding_score(history, ROTATION, {"t"})
+    assert feats["equations"] == 0
+    assert score is None  # solved, but nothing shows understanding: ask Gemini
+
+
+@pytest.mark.parametrize("text", [
+    r"$\theta$ and $\rho$ and $\mu$",
+    r"so $e =$ ?",
+    r"$\omega r$ maybe, or $I\alpha$",
+])
+def test_symbols_without_relations_do_not_count(text):
+    feats = logic.score_features(session(text), {"category": "Rigid Body Kinematics (Rotation) Impact"})
+    assert feats["equations"] == 0
+
+
+@pytest.mark.parametrize("prob, text, expected", [
+    (ROTATION, r"$\omega = \alpha t$ and $a_n = r\omega^2$, $a_t = r\alpha$", 3),
+    (IMPACT, r"$e = \sqrt{h_2/h_1}$", 1),
+    (IMPACT, r"$m_A v_A + m_B v_B = (m_A + m_B) v'$", 1),
+    ({"category": "Impulse and Momentum"}, "by conservation of momentum the block moves", 1),
+])
+def test_relations_and_named_laws_count(prob, text, expected):
+    assert logic.score_features(session(text), prob)["equations"] == expected
+
+
+def test_high_band_needs_relations_latex_solved_and_turns():
+    history = session(
+        r"Constant $\alpha$, so $\omega = \alpha t$ with $\alpha = 2\pi N / (60 t_1)$",
+        r"At 45 degrees $a_n = a_t$, i.e. $r\omega^2 = r\alpha$ using $a_n = r\omega^2$ and $a_t = r\alpha$",
+        r"$t = 1/\sqrt{\alpha} = 0.178$ s",
+    )
+    assert logic.local_understanding_score(history, ROTATION, {"t"})[0] == 8
+    # Same work squeezed into fewer turns than MIN_TURNS_CONFIDENT is left to Gemini
+    short = history[:2 * (logic.MIN_TURNS_CONFIDENT - 1)]
+    assert logic.local_understanding_score(short, ROTATION, {"t"})[0] is None
+    # ... as is a session that did not solve every target
+    assert logic.local_understanding_score(history, ROTATION, set())[0] is None
+
+
+def test_shadow_skips_agreement_when_gemini_fails(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(logic, "SCORE_SHADOW", True)
+    monkeypatch.setattr(logic, "llm_understanding_score", lambda history, model=None: None)
+    assert logic.evaluate_understanding_score(session("no idea"), ROTATION, set()) == 1
+    names = [c["name"] for c in metrics.snapshot()["counters"]]
+    assert "tutor_score_agreement_total" not in names
+
+
+def test_interactive_score_falls_back_to_zero(monkeypatch):
+    monkeypatch.setattr(logic, "llm_understanding_score", lambda history, model=None: None)
+    assert logic.evaluate_understanding_score(session("a", "b", "c"), ROTATION, set()) == 0
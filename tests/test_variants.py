@@ -0,0 +1,53 @@
+"""Per-student variants: derived from the catalog bodies and never accepting the published answer."""
+import numpy as np
+import pytest
+from catalog_v2_GitHub import get_problem
+from logic_v2_GitHub import check_numeric_match
+from variants_v2_GitHub import TEMPLATES, TOLERANCE, generate_variants, template_statement, variant_problem, warm_variants
+import variants_v2_GitHub as variants
+
+SEEDS = np.arange(2000, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+
+
+@pytest.mark.parametrize("pid", list(TEMPLATES))
+def test_template_fits_catalog_body(pid):
+    prob = get_problem(pid)
+    assert template_statement(prob) is not None
+    variant = variant_problem(prob, 12345)
+    assert variant["statement"] != prob["statement"]
+    assert set(variant["targets"]) == set(prob["targets"])
+    # LaTeX of the published statement survives the templating
+    for token in ("$e$", "$n$", "$v$", "$t$", r"$|\Delta E|$", r"$45^{\circ}$"):
+        assert (token in prob["statement"]) == (token in variant["statement"])
+
+
+@pytest.mark.parametrize("pid", list(TEMPLATES))
+def test_published_answer_is_never_accepted(pid):
+    prob = get_problem(pid)
+    _, targets = generate_variants(prob, SEEDS)
+    for name, values in targets.items():
+        assert np.isfinite(values).all()
+        if name in TEMPLATES[pid].get("keep_published", ()):
+            continue
+        assert not any(check_numeric_match(str(prob["targets"][name]), v) for v in values[:200])
+        assert not (np.abs(prob["targets"][name] - values) <= TOLERANCE * np.abs(values)).any()
+
+
+def test_bullet_stays_much_lighter_than_block():
+    params, _ = generate_variants(get_problem("176"), SEEDS)
+    assert (params["m_g"] / 1000.0 < params["M"] / 100).all()
+
+
+def test_single_variant_matches_roster_batch():
+    prob = get_problem("K_2.6_3")
+    variants._cache.clear()
+    alone = variant_problem(prob, int(SEEDS[7]))
+    variants._cache.clear()
+    warm_variants([prob], [int(s) for s in SEEDS[:10]])
+    assert variant_problem(prob, int(SEEDS[7])) == alone
+
+
+def test_template_that_no_longer_fits_returns_published_problem():
+    prob = dict(get_problem("252"), statement="Reworded problem without the angle.")
+    variants._cache.clear()
+    assert variant_problem(prob, 1) is prob
@@ -0,0 +1,266 @@
+"""Parametric problem variants: per-student numbers with targets computed in batch.
+
+A template rewrites the published problem (as loaded from the catalog) by
+replacing the given numbers in its statement with placeholders, and adds a grid
+of parameter values (low, high, step) and a NumPy solver that maps parameter
+arrays to target arrays keyed by the catalog's target names. Parameters are
+drawn from a counter-based hash of (problem, seed, parameter, attempt), so one
+student's variant is identical whether it is generated alone or as part of a
+whole roster, and no RNG state is kept between calls. A draw whose answer for
+any target would also accept the published answer is redrawn with the next
+attempt number, except for targets the physics pins near the published value
+("keep_published"), where the other targets carry the difference.
+"""
+import hashlib
+import math
+import threading
+from metrics_v2_GitHub import record_cache, traced
+
+G = 9.81
+VARIANT_NOTE = " (Numbers in the figure may differ; use the values given here.)"
+CACHE_SIZE = 20000
+TOLERANCE = 0.05    # check_numeric_match's default
+MAX_ATTEMPTS = 64   # redraws per seed before the grid is considered broken
+
+_MASK64 = (1 << 64) - 1
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _solve_176(p, np):
+    m = p["m_g"] / 1000.0
+    v1 = m * p["v0"] / (m + p["M"])
+    energy = 0.5 * m * p["v0"] ** 2
+    return {"|\\Delta E|": energy - 0.5 * (m + p["M"]) * v1 ** 2, "n": 100.0 * p["M"] / (m + p["M"])}
+
+
+def _solve_198(p, np):
+    return {"v": p["m_r"] * np.sqrt(2 * G * p["h"]) / (p["m_r"] + p["m_p"])}
+
+
+def _solve_239(p, np):
+    # The waist must be clearly below the shoulder; other draws are NaN and get redrawn
+    ratio = p["h2"] / p["h1"]
+    ratio = np.where(ratio <= 0.9, ratio, np.nan)
+    return {"e": np.sqrt(ratio), "n": 100.0 * (1 - ratio)}
+
+
+def _solve_252(p, np):
+    # v' ⟂ v  =>  (e v sinθ)(v sinθ) = (v cosθ)^2  =>  e = cot^2 θ
+    return {"e": 1.0 / np.tan(np.radians(p["theta"])) ** 2}
+
+
+def _solve_k263(p, np):
+    # a_n = a_t at 45°:  r ω^2 = r α  with ω = α t  =>  t = 1/sqrt(α)
+    alpha = p["N"] * 2 * np.pi / 60.0 / p["t1"]
+    return {"t": 1.0 / np.sqrt(alpha)}
+
+
+# "replace": (text in the published statement, placeholder) pairs; each text must occur exactly once
+# "keep_published": targets exempt from the published-answer redraw (the physics pins them)
+TEMPLATES = {
+    "176": {
+        "replace": [("75-g", "{m_g:.0f}-g"), ("600 m/s", "{v0:.0f} m/s"), ("50-kg", "{M:g}-kg")],
+        "params": {"m_g": (20, 150, 5), "v0": (200, 1000, 10), "M": (20, 100, 1)},
+        "solve": _solve_176,
+        # n = M/(m+M) stays near 99.8% for any bullet into a heavy block; only |ΔE| can move away
+        "keep_published": ("n",),
+    },
+    "198": {
+        "replace": [("450-kg", "{m_r:.0f}-kg"), ("falls 1.4 m", "falls {h:.2f} m"), ("240-kg", "{m_p:.0f}-kg")],
+        "params": {"m_r": (200, 1000, 10), "h": (0.5, 4.0, 0.05), "m_p": (100, 1000, 10)},
+        "solve": _solve_198,
+    },
+    "239": {
+        "replace": [("a ball just passes the test as indicated in the figure",
+                     "a ball dropped from a shoulder height of {h1:.0f} mm just passes the test "
+                     "by rebounding to a waist height of {h2:.0f} mm")],
+        "params": {"h1": (1200, 2000, 10), "h2": (200, 1200, 10)},
+        "solve": _solve_239,
+    },
+    "252": {
+        "replace": [("60°", "{theta:g}°")],
+        "params": {"theta": (46, 75, 0.5)},
+        "solve": _solve_252,
+    },
+    "K_2.6_3": {
+        "replace": [("$N = 600$", "$N = {N:.0f}$"), ("$2$ seconds", "${t1:g}$ seconds")],
+        "params": {"N": (200, 3000, 50), "t1": (0.5, 6.0, 0.5)},
+        "solve": _solve_k263,
+    },
+}
+
+
+def template_statement(prob):
+    """The published statement with this template's placeholders, or None if it does not fit."""
+    template = TEMPLATES.get(prob.get("id"))
+    statement = prob.get("statement", "")
+    if template is None:
+        return None
+    text = statement.replace("{", "{{").replace("}", "}}")
+    for old, new in template["replace"]:
+        if statement.count(old) != 1:
+            return None
+        text = text.replace(old, new)
+    return text
+
+
+def student_seed(user_name):
+    """Stable 63-bit seed for a student name (case/whitespace-insensitive)."""
+    digest = hashlib.sha256(user_name.strip().lower().encode()).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def _key(text):
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def _splitmix64(x, np):
+    """Vectorised SplitMix64 finaliser on a uint64 array (wrap-around arithmetic)."""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def sample_params(pid, seeds, attempt=0):
+    """Draws each template parameter for an array of seeds; returns {name: float array}."""
+    import numpy as np
+    seeds = np.asarray(seeds, dtype=np.uint64)
+    params = {}
+    for name, (low, high, step) in TEMPLATES[pid]["params"].items():
+        steps = int(round((high - low) / step)) + 1
+        salt = np.uint64(_key(f"{pid}:{name}:{attempt}" if attempt else f"{pid}:{name}") & _MASK64)
+        with np.errstate(over="ignore"):
+            h = _splitmix64(seeds ^ salt, np)
+        params[name] = np.round(low + (h % np.uint64(steps)).astype(np.float64) * step, 6)
+    return params
+
+
+def _solve(pid, params, n, np):
+    targets = TEMPLATES[pid]["solve"](params, np)
+    return {k: np.array(np.broadcast_to(v, n), dtype=np.float64) for k, v in targets.items()}
+
+
+def _needs_redraw(prob, targets, np):
+    """True where a variant's answer would also accept the published answer (or is not finite)."""
+    published = prob.get("targets", {})
+    exempt = TEMPLATES[prob["id"]].get("keep_published", ())
+    redraw = np.zeros(len(next(iter(targets.values()))), dtype=bool)
+    for name, answer in targets.items():
+        redraw |= ~np.isfinite(answer)
+        c = published.get(name)
+        if isinstance(c, (int, float)) and name not in exempt:
+            redraw |= np.abs(c - answer) <= TOLERANCE * np.abs(answer)
+    return redraw
+
+
+@traced("generate_variants")
+def generate_variants(prob, seeds):
+    """Batch-computes parameters and targets for many seeds of one templated problem."""
+    import numpy as np
+    pid = prob["id"]
+    seeds = np.asarray(seeds, dtype=np.uint64)
+    params = sample_params(pid, seeds)
+    targets = _solve(pid, params, len(seeds), np)
+    redraw = _needs_redraw(prob, targets, np)
+    for attempt in range(1, MAX_ATTEMPTS):
+        if not redraw.any():
+            break
+        idx = np.flatnonzero(redraw)
+        retry = sample_params(pid, seeds[idx], attempt)
+        retry_targets = _solve(pid, retry, len(idx), np)
+        for name in params:
+            params[name][idx] = retry[name]
+        for name in targets:
+            targets[name][idx] = retry_targets[name]
+        redraw[idx] = _needs_redraw(prob, retry_targets, np)
+    if redraw.any():
+        raise RuntimeError(f"{pid}: {int(redraw.sum())} draws still match the published answer after {MAX_ATTEMPTS} attempts")
+    return params, targets
+
+
+def _sig(x, digits=4):
+    return float(f"{x:.{digits}g}") if math.isfinite(x) else x
+
+
+def _build(prob, seed, params, targets, i):
+    """Materialises the i-th variant of a batch as a problem dict (prob itself if the template no longer fits)."""
+    statement = template_statement(prob)
+    if statement is None or set(targets) != set(prob.get("targets", {})):
+        return prob
+    values = {k: float(v[i]) for k, v in params.items()}
+    variant = dict(prob)
+    variant["statement"] = statement.format(**values) + VARIANT_NOTE
+    variant["targets"] = {k: _sig(float(v[i])) for k, v in targets.items()}
+    variant["variant_seed"] = seed
+    variant["variant_params"] = values
+    return variant
+
+
+def _store(key, variant):
+    with _cache_lock:
+        if len(_cache) >= CACHE_SIZE:
+            _cache.pop(next(iter(_cache)))
+        _cache[key] = variant
+
+
+def variant_problem(prob, seed):
+    """Returns this seed's variant of prob (cached per (problem, seed)), or prob if not templated."""
+    pid = prob.get("id")
+    if pid not in TEMPLATES:
+        return prob
+    key = (pid, seed)
+    with _cache_lock:
+        variant = _cache.get(key)
+    record_cache("variants", variant is not None)
+    if variant is None:
+        params, targets = generate_variants(prob, [seed])
+        variant = _build(prob, seed, params, targets, 0)
+        _store(key, variant)
+    return variant
+
+
+def warm_variants(problems, seeds):
+    """Pre-generates variants of every templated problem for a roster (or one student)."""
+    seeds = list(seeds)
+    for prob in problems:
+        if prob.get("id") not in TEMPLATES:
+            continue
+        params, targets = generate_variants(prob, seeds)
+        for i, seed in enumerate(seeds):
+            _store((prob["id"], seed), _build(prob, seed, params, targets, i))
+
+
+def main():
+    import argparse
+    import csv
+    import json
+    from logic_v2_GitHub import load_problems
+
+    parser = argparse.ArgumentParser(description="Write a per-student answer key for templated problems.")
+    parser.add_argument("roster", help="text file with one student name per line (as typed at login)")
+    parser.add_argument("--out", default="answer_key.csv")
+    args = parser.parse_args()
+
+    with open(args.roster) as f:
+        names = [line.strip() for line in f if line.strip()]
+    seeds = [student_seed(n) for n in names]
+    with open(args.out, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["student", "problem_id", "parameters", "targets"])
+        for prob in load_problems():
+            if prob.get("id") not in TEMPLATES:
+                continue
+            params, targets = generate_variants(prob, seeds)
+            for i, name in enumerate(names):
+                writer.writerow([
+                    name, prob["id"],
+                    json.dumps({k: float(v[i]) for k, v in params.items()}),
+                    json.dumps({k: _sig(float(v[i])) for k, v in targets.items()}, ensure_ascii=False),
+                ])
+    print(f"Wrote answers for {len(names)} students x {len(TEMPLATES)} templates to {args.out}")
+
+
+if __name__ == "__main__":
+    main()